@@ -1,9 +1,15 @@
 import streamlit as st
-import time
-from evaluator import AnswerEvaluator
-from utils import extract_text_from_pdf, extract_text_from_image, generate_pdf_report
+import hashlib, time
+import telemetry
+from evaluator import FAST_MODEL, batch_usage, rescore
+from groq_client import rate_limit, set_rate_limit
+from jobs import ACTIVE, get_job_queue
+from utils import generate_pdf_report, generate_class_report, needs_extraction, read_file
+
+POLL_S = 1.0        # seconds between reruns while a background job is running
 
 st.set_page_config(page_title="SmartGrade AI", page_icon="🎓", layout="wide")
+telemetry.serve_from_env()      # /metrics for Prometheus when $SMARTGRADE_METRICS_PORT is set
 
 st.markdown("""<style>
 @import url('https://fonts.googleapis.com/css2?family=Sora:wght@400;600;700&family=JetBrains+Mono&display=swap');
@@ -49,6 +55,20 @@ with st.sidebar:
         "gemma2-9b-it"
     ])
 
+    cascade = st.toggle(f"🪜 Cascade from {FAST_MODEL}", value=False, disabled=model_choice == FAST_MODEL,
+                        help="Grade with the fast model first; only borderline or failed questions "
+                             "are re-graded with the model above")
+
+    with st.expander("🚦 Rate limits"):
+        st.caption("Groq free-tier quotas by default — raise them to match a paid key (0 = no local limit). "
+                   "They apply to every session on this server.")
+        for m in [model_choice] + ([FAST_MODEL] if cascade and model_choice != FAST_MODEL else []):
+            rpm, tpm = rate_limit(m)
+            c1, c2   = st.columns(2)
+            rpm = c1.number_input(f"{m} · requests/min", min_value=0, value=int(rpm or 0), step=10, key=f"rpm:{m}")
+            tpm = c2.number_input("tokens/min", min_value=0, value=int(tpm or 0), step=1000, key=f"tpm:{m}")
+            set_rate_limit(m, rpm or None, tpm or None)
+
     st.markdown("---")
     st.markdown("**📊 Grading Scale**")
     grade_a = st.slider("A ≥", 50, 100, 85)
@@ -59,15 +79,47 @@ with st.sidebar:
     strictness     = st.select_slider("🎯 Strictness", ["Lenient", "Moderate", "Strict"], value="Moderate")
     st.caption("**Lenient**: Credit for basic understanding\n**Moderate**: Require clear explanations\n**Strict**: Demand complete details")
     partial_credit = st.toggle("Allow Partial Credit", value=True)
+    segmented      = st.toggle("🧩 Grade each question separately", value=False,
+                               help="One small request per question, in parallel — best for long papers")
+    use_cache      = st.toggle("♻️ Reuse cached results", value=True,
+                               help="Skip Groq when this exact sheet was already graded with the same settings")
+    save_results   = st.toggle("📊 Save results for analytics", value=True,
+                               help="Keep every graded sheet for the Analytics page")
+    prescore       = st.toggle("⚡ Skip blank answers", value=True,
+                               help="Score empty, \"N/A\" and \"I don't know\" answers 0 locally instead of sending them to Groq")
+    skip_off_topic = st.toggle("🚫 Also skip off-topic answers", value=False, disabled=not prescore,
+                               help="Zero-score very short answers that share no words with their question. "
+                                    "Can zero a correct one-word answer — check the results")
+    off_topic_conf = st.slider("Off-topic confidence", 0.90, 1.00, 0.95, 0.01, disabled=not (prescore and skip_off_topic),
+                               help="How sure the local check must be before it zero-scores an answer")
+    st.markdown("---")
+    st.markdown("**👥 Class Mode**")
+    concurrency    = st.slider("⚡ Sheets graded in parallel", 1, 16, 4)
+    st.markdown("---")
+    show_timings   = st.toggle("⏱️ Show timing panel", value=False,
+                               help="Where the time goes: extraction, OCR, LLM calls, parsing and PDF building")
 
-input_mode    = st.radio("📥 Input Method", ["✏️ Manual Text", "📄 Upload Files"], horizontal=True)
+input_mode    = st.radio("📥 Input Method", ["✏️ Manual Text", "📄 Upload Files", "👥 Class Mode"], horizontal=True)
 col1, col2    = st.columns(2)
 question_text = answer_text = ""
+class_sheets  = []
+queue         = get_job_queue()
+waiting       = []          # ids of background jobs this run is still waiting on
 
-def read_file(f):
-    if f.type == "application/pdf":   return extract_text_from_pdf(f, api_key=api_key)
-    if f.type.startswith("image"):    return extract_text_from_image(f, api_key=api_key)
-    return f.read().decode("utf-8")
+def read_upload(f):
+    """Text of an upload.  PDFs / images are extracted by a background job: None until it finishes."""
+    if not needs_extraction(f.type):
+        return read_file(f)
+    data = f.getvalue()
+    job  = queue.get(queue.submit("extract", {"mime_type": f.type, "vision": bool(api_key)}, data=data,
+                                  secrets={"api_key": api_key},
+                                  key=f"extract:{bool(api_key)}:{hashlib.sha256(data).hexdigest()}"))
+    if job["status"] in ACTIVE:
+        waiting.append(job["id"])
+        return None
+    if job["status"] != "done":
+        return f"[Extraction failed: {job['error']}]"
+    return job["result"]
 
 if input_mode == "✏️ Manual Text":
     with col1:
@@ -78,14 +130,40 @@ if input_mode == "✏️ Manual Text":
         st.markdown("#### 📝 Answer Sheet")
         answer_text = st.text_area("ans", height=280, label_visibility="collapsed",
             placeholder="Q1. Machine learning is a subset of AI...\nQ2. Supervised learning uses labeled data...")
+elif input_mode == "👥 Class Mode":
+    with col1:
+        st.markdown("#### 📋 Question Paper")
+        f = st.file_uploader("Upload 📋 Question Paper", type=["pdf","png","jpg","jpeg","txt"], key="cq_up")
+        if f:
+            question_text = read_upload(f)
+            if question_text is None:
+                st.info("⏳ Extracting in the background...")
+                question_text = ""
+            else:
+                st.success(f"✅ {len(question_text)} characters extracted")
+                with st.expander("Preview"): st.text(question_text[:500])
+    with col2:
+        st.markdown("#### 📝 Answer Sheets")
+        files = st.file_uploader("Upload 📝 Answer Sheets", type=["pdf","png","jpg","jpeg","txt"],
+                                 key="ca_up", accept_multiple_files=True)
+        if files:
+            texts = [(f.name, read_upload(f)) for f in files]
+            ready = [(name, text) for name, text in texts if text is not None]
+            if len(ready) < len(texts):
+                st.info(f"⏳ Extracting in the background... {len(ready)}/{len(texts)} sheets ready")
+            else:
+                class_sheets = ready
+                st.success(f"✅ {len(class_sheets)} answer sheets loaded")
 else:
     for label, key, var in [("📋 Question Paper", "q_up", "q"), ("📝 Answer Sheet", "a_up", "a")]:
         with (col1 if var == "q" else col2):
             st.markdown(f"#### {label}")
             f = st.file_uploader(f"Upload {label}", type=["pdf","png","jpg","jpeg","txt"], key=key)
             if f:
-                with st.spinner("Extracting..."):
-                    text = read_file(f)
+                text = read_upload(f)
+                if text is None:
+                    st.info("⏳ Extracting in the background...")
+                    continue
                 st.success(f"✅ {len(text)} characters extracted")
                 with st.expander("Preview"): st.text(text[:500])
                 if var == "q": question_text = text
@@ -93,7 +171,8 @@ else:
 
 _, bc, _ = st.columns([1, 2, 1])
 with bc:
-    run = st.button("🚀 Evaluate Answer Sheet", use_container_width=True)
+    run = st.button("🚀 Evaluate Class" if input_mode == "👥 Class Mode" else "🚀 Evaluate Answer Sheet",
+                    use_container_width=True)
 
 def get_grade(p):
     for threshold, letter, name in [(grade_a,"A","Excellent"),(grade_b,"B","Good"),(grade_c,"C","Average"),(grade_d,"D","Pass")]:
@@ -104,88 +183,266 @@ def badge(earned, max_m):
     cls = "bz" if earned == 0 else "bf" if earned >= max_m else "bp"
     return f'<span class="badge {cls}">{earned} / {max_m}</span>'
 
+def render_summary(result):
+    te  = result.get("total_earned", 0)
+    tm  = result.get("total_max", 0)
+    pct = round((te / tm * 100) if tm else 0, 1)
+    gl, gn = get_grade(pct)
+    qs  = result.get("questions", [])
+
+    st.markdown("---\n## 📊 Evaluation Results")
+    if result.get("failed_questions"):
+        st.warning("⚠️ Could not grade " + ", ".join(f"Q{n}" for n in result["failed_questions"])
+                   + " — scored 0. Re-run to retry them.")
+    s1, s2, s3 = st.columns([1, 1, 2])
+
+    with s1:
+        st.markdown(f"""<div class="card" style="text-align:center">
+          <div class="ring grade-{gl}"><div class="rv">{pct}%</div><div class="rl">SCORE</div></div>
+          <div style="font-size:2rem;font-weight:700">{gl}</div>
+          <div style="color:#8b949e;font-size:.85rem">{gn}</div></div>""", unsafe_allow_html=True)
+
+    with s2:
+        full = sum(1 for q in qs if q.get("earned",0) >= q.get("max_marks",1))
+        part = sum(1 for q in qs if 0 < q.get("earned",0) < q.get("max_marks",1))
+        zero = sum(1 for q in qs if q.get("earned",0) == 0)
+        st.markdown(f"""<div class="card">
+          <div style="font-weight:600;margin-bottom:.75rem">📈 Breakdown</div>
+          <div style="display:flex;justify-content:space-between;margin-bottom:4px">
+            <span style="font-size:.85rem">Marks</span>
+            <span style="font-family:'JetBrains Mono';font-weight:600">{te} / {tm}</span></div>
+          <div class="pbo"><div class="pbi" style="width:{pct}%"></div></div>
+          <div class="sg">
+            <div class="si"><div class="sn" style="color:#3fb950">{full}</div><div class="sl">Full</div></div>
+            <div class="si"><div class="sn" style="color:#d29922">{part}</div><div class="sl">Partial</div></div>
+            <div class="si"><div class="sn" style="color:#ff7b72">{zero}</div><div class="sl">Zero</div></div>
+          </div></div>""", unsafe_allow_html=True)
+
+    with s3:
+        st.markdown(f"""<div class="card" style="height:100%">
+          <div style="font-weight:600;margin-bottom:.75rem">💬 Overall Feedback</div>
+          <div style="color:#cdd9e5;font-size:.9rem;line-height:1.6">{result.get("overall_feedback","")}</div>
+        </div>""", unsafe_allow_html=True)
+    st.caption(usage_line(result.get("usage"), result.get("cached")))
+    if result.get("escalated_questions"):
+        st.caption("🪜 Re-graded by the larger model: " + ", ".join(f"Q{n}" for n in result["escalated_questions"]))
+
+def usage_line(usage, cached=False):
+    if cached:
+        return "♻️ Served from cache — no Groq calls"
+    if not usage or not usage.get("calls"):
+        return ""
+    return (f"🔢 {usage['calls']} call(s) · {usage['prompt_tokens']:,} prompt + {usage['completion_tokens']:,} "
+            f"completion tokens · {usage['latency_s']:.1f}s model time · ≈${usage['cost_usd']:.4f}")
+
+def render_question(i, q):
+    earned, max_m = q.get("earned",0), q.get("max_marks",0)
+    sim = q.get("similarity_score", 0)
+    sc  = "#3fb950" if sim>=70 else "#d29922" if sim>=40 else "#ff7b72"
+    n   = q.get("question_number", i)
+    with st.expander(f"Q{n}. {q.get('question','')[:80]}...  {badge(earned,max_m)}", expanded=i<=3):
+        a, b = st.columns(2)
+        with a:
+            st.markdown("**📋 Question**");      st.info(q.get("question",""))
+            st.markdown("**✍️ Student Answer**")
+            ans = q.get("student_answer","").strip()
+            st.warning(ans if ans else "_No answer_")
+        with b:
+            st.markdown(f"""<div style="background:#161b22;border:1px solid #30363d;border-radius:8px;padding:1rem;margin-bottom:.75rem">
+              <div style="display:flex;justify-content:space-between;margin-bottom:8px">
+                <span style="font-size:.85rem;color:#8b949e">Similarity ({strictness})</span>
+                <span style="font-family:'JetBrains Mono';font-weight:700;color:{sc}">{sim}%</span></div>
+              <div class="pbo"><div style="height:100%;border-radius:4px;background:{sc};width:{sim}%"></div></div>
+            </div>""", unsafe_allow_html=True)
+            st.markdown(f"**💡 Feedback:** {q.get('feedback','')}")
+            kp, mp = q.get("key_points_covered",[]), q.get("missing_points",[])
+            if kp: st.markdown("**✅ Covered:** " + " · ".join(kp))
+            if mp: st.markdown("**❌ Missing:** " + " · ".join(mp))
+
+def render_report(result, file_name="evaluation_report.pdf", key=None, student=None):
+    st.markdown("---")
+
+    # Generate PDF
+    pdf_data = generate_pdf_report(result, model_choice, strictness, student)
+    if pdf_data:
+        st.download_button("📄 Download PDF Report", data=pdf_data, key=key,
+                           file_name=file_name, mime="application/pdf")
+    else:
+        st.error("⚠️ PDF generation failed. Install: pip install reportlab")
+
+def render_result(result, file_name="evaluation_report.pdf", key=None, student=None):
+    if "error" in result:
+        st.error(f"❌ {result['error']}")
+        return
+    render_summary(result)
+    st.markdown("### 📝 Question-wise Analysis")
+    for i, q in enumerate(result.get("questions", []), 1):
+        render_question(i, q)
+    render_report(result, file_name, key, student)
+
+def stale_notice(graded_with):
+    # Partial credit and grade thresholds are re-derived locally; anything else needs a new LLM pass
+    if graded_with != (model_choice, strictness, segmented):
+        st.info("⚙️ Model / strictness changed since these sheets were graded — marks below use the previous "
+                "settings. Click Evaluate to regrade.")
+
+def render_class(names, results, elapsed, graded_with):
+    results = [rescore(r, partial_credit) for r in results]
+    stale_notice(graded_with)
+    rows = []
+    for name, r in zip(names, results):
+        if "error" in r:
+            rows.append({"Student": name, "Score": "—", "%": None, "Grade": "Error", "Time (s)": r.get("elapsed"),
+                         "Tokens": (r.get("usage") or {}).get("total_tokens")})
+            continue
+        te, tm = r.get("total_earned", 0), r.get("total_max", 0)
+        pct    = round((te / tm * 100) if tm else 0, 1)
+        r["grade"], r["grade_name"] = get_grade(pct)
+        rows.append({"Student": name, "Score": f"{te} / {tm}", "%": pct,
+                     "Grade": r["grade"], "Time (s)": r.get("elapsed"),
+                     "Tokens": (r.get("usage") or {}).get("total_tokens")})
+
+    graded = sum(1 for r in results if "error" not in r)
+    st.markdown("---\n## 👥 Class Results")
+    usage = batch_usage(results)
+    st.caption(f"{graded}/{len(results)} sheets graded in {elapsed:.1f}s "
+               f"(sum of per-sheet time {sum(r.get('elapsed', 0) for r in results):.1f}s) · "
+               f"{usage['total_tokens']:,} tokens · ≈${usage['cost_usd']:.4f} "
+               f"(≈${usage['per_sheet']['cost_usd']:.4f} / sheet)")
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+    # Summary table + every student's report in one PDF, rendered across processes on demand
+    students = [n.rsplit('.', 1)[0] for n in names]
+    settings = (partial_credit, grade_a, grade_b, grade_c, grade_d)
+    built    = st.session_state.get("class_report")
+    if (built is None or built[0] != settings) and st.button("📚 Build class report"):
+        with st.spinner(f"📄 Rendering {graded} reports..."):
+            built = (settings, generate_class_report(results, students, model_choice, strictness))
+        st.session_state["class_report"] = built
+    if built and built[0] == settings:
+        if built[1]:
+            st.download_button("📚 Download Class Report", data=built[1], key="class_pdf",
+                               file_name="class_report.pdf", mime="application/pdf")
+        else:
+            st.error("⚠️ Class report generation failed. Install: pip install reportlab pymupdf")
+
+    pick = st.selectbox("🔎 View student", range(len(names)), format_func=lambda i: names[i])
+    render_result(results[pick], file_name=f"{students[pick]}_report.pdf", key=f"pdf_{pick}",
+                  student=students[pick])
+
+def submit_job(kind, **payload):
+    cascading = cascade and model_choice != FAST_MODEL
+    payload.update(question_text=question_text, model=FAST_MODEL if cascading else model_choice,
+                   cascade_model=model_choice if cascading else None, strictness=strictness,
+                   partial_credit=partial_credit, segmented=segmented, use_cache=use_cache,
+                   save_results=save_results, prescore=prescore,
+                   prescore_threshold=off_topic_conf if prescore and skip_off_topic else None)
+    job_id = queue.submit(kind, payload, secrets={"api_key": api_key})
+    st.session_state["active_job"] = job_id
+    st.query_params["job"]         = job_id
+
 if run:
     if not api_key:                 st.error("⚠️ Please enter your Groq API key.")
+    elif waiting:                   st.warning("⏳ Uploads are still being extracted — try again in a moment.")
     elif not question_text.strip(): st.error("⚠️ Please provide the question paper.")
+    elif input_mode == "👥 Class Mode":
+        if not class_sheets:
+            st.error("⚠️ Please upload at least one answer sheet.")
+        else:
+            submit_job("evaluate_class", names=[n for n, _ in class_sheets], sheets=[t for _, t in class_sheets],
+                       concurrency=concurrency)
     elif not answer_text.strip():   st.error("⚠️ Please provide the answer sheet.")
     else:
-        with st.spinner("🔍 Evaluating..."):
-            prog = st.progress(0, "Connecting...")
-            time.sleep(0.2)
-            prog.progress(20, f"{strictness} evaluation...")
-            result = AnswerEvaluator(api_key, model_choice, strictness, partial_credit).evaluate(question_text, answer_text)
-            prog.progress(100, "Done!"); time.sleep(0.3); prog.empty()
-
-        if "error" in result:
-            st.error(f"❌ {result['error']}")
-        else:
-            te  = result.get("total_earned", 0)
-            tm  = result.get("total_max", 0)
-            pct = round((te / tm * 100) if tm else 0, 1)
-            gl, gn = get_grade(pct)
-            qs  = result.get("questions", [])
-
-            st.markdown("---\n## 📊 Evaluation Results")
-            s1, s2, s3 = st.columns([1, 1, 2])
-
-            with s1:
-                st.markdown(f"""<div class="card" style="text-align:center">
-                  <div class="ring grade-{gl}"><div class="rv">{pct}%</div><div class="rl">SCORE</div></div>
-                  <div style="font-size:2rem;font-weight:700">{gl}</div>
-                  <div style="color:#8b949e;font-size:.85rem">{gn}</div></div>""", unsafe_allow_html=True)
-
-            with s2:
-                full = sum(1 for q in qs if q.get("earned",0) >= q.get("max_marks",1))
-                part = sum(1 for q in qs if 0 < q.get("earned",0) < q.get("max_marks",1))
-                zero = sum(1 for q in qs if q.get("earned",0) == 0)
-                st.markdown(f"""<div class="card">
-                  <div style="font-weight:600;margin-bottom:.75rem">📈 Breakdown</div>
-                  <div style="display:flex;justify-content:space-between;margin-bottom:4px">
-                    <span style="font-size:.85rem">Marks</span>
-                    <span style="font-family:'JetBrains Mono';font-weight:600">{te} / {tm}</span></div>
-                  <div class="pbo"><div class="pbi" style="width:{pct}%"></div></div>
-                  <div class="sg">
-                    <div class="si"><div class="sn" style="color:#3fb950">{full}</div><div class="sl">Full</div></div>
-                    <div class="si"><div class="sn" style="color:#d29922">{part}</div><div class="sl">Partial</div></div>
-                    <div class="si"><div class="sn" style="color:#ff7b72">{zero}</div><div class="sl">Zero</div></div>
-                  </div></div>""", unsafe_allow_html=True)
-
-            with s3:
-                st.markdown(f"""<div class="card" style="height:100%">
-                  <div style="font-weight:600;margin-bottom:.75rem">💬 Overall Feedback</div>
-                  <div style="color:#cdd9e5;font-size:.9rem;line-height:1.6">{result.get("overall_feedback","")}</div>
-                </div>""", unsafe_allow_html=True)
+        submit_job("evaluate", answer_text=answer_text)
 
+# Grading runs in the job queue, so reruns and refreshes don't kill it; the URL remembers the job id
+job_id = st.session_state.get("active_job")
+if job_id is None and st.query_params.get("job") not in (None, st.session_state.get("seen_job")):
+    job_id = st.query_params["job"]
+job = queue.get(job_id) if job_id else None
+
+if job and job["status"] in ACTIVE:
+    st.session_state["active_job"] = job_id
+    progress = job["progress"] or {}
+    done, total = progress.get("done", 0), progress.get("total", 0)
+    if job["kind"] == "evaluate_class":
+        st.progress(done / total if total else 0, f"🔍 Grading class — {done} of {total or '?'} sheets done...")
+    else:
+        st.progress(min(done / total, 1.0) if total else 0,
+                    f"Graded {done} of {total} questions..." if done else "🔍 Waiting for the first question...")
+        if progress.get("questions"):
             st.markdown("### 📝 Question-wise Analysis")
-            for i, q in enumerate(qs, 1):
-                earned, max_m = q.get("earned",0), q.get("max_marks",0)
-                sim = q.get("similarity_score", 0)
-                sc  = "#3fb950" if sim>=70 else "#d29922" if sim>=40 else "#ff7b72"
-                with st.expander(f"Q{i}. {q.get('question','')[:80]}...  {badge(earned,max_m)}", expanded=i<=3):
-                    a, b = st.columns(2)
-                    with a:
-                        st.markdown("**📋 Question**");      st.info(q.get("question",""))
-                        st.markdown("**✍️ Student Answer**")
-                        ans = q.get("student_answer","").strip()
-                        st.warning(ans if ans else "_No answer_")
-                    with b:
-                        st.markdown(f"""<div style="background:#161b22;border:1px solid #30363d;border-radius:8px;padding:1rem;margin-bottom:.75rem">
-                          <div style="display:flex;justify-content:space-between;margin-bottom:8px">
-                            <span style="font-size:.85rem;color:#8b949e">Similarity ({strictness})</span>
-                            <span style="font-family:'JetBrains Mono';font-weight:700;color:{sc}">{sim}%</span></div>
-                          <div class="pbo"><div style="height:100%;border-radius:4px;background:{sc};width:{sim}%"></div></div>
-                        </div>""", unsafe_allow_html=True)
-                        st.markdown(f"**💡 Feedback:** {q.get('feedback','')}")
-                        kp, mp = q.get("key_points_covered",[]), q.get("missing_points",[])
-                        if kp: st.markdown("**✅ Covered:** " + " · ".join(kp))
-                        if mp: st.markdown("**❌ Missing:** " + " · ".join(mp))
-
-            st.markdown("---")
-            
-            # Generate PDF
-            pdf_data = generate_pdf_report(result, model_choice, strictness)
-            if pdf_data:
-                st.download_button("📄 Download PDF Report", data=pdf_data,
-                                   file_name="evaluation_report.pdf", mime="application/pdf")
-            else:
-                st.error("⚠️ PDF generation failed. Install: pip install reportlab")
\ No newline at end of file
+            for n, q in enumerate(progress["questions"], 1):
+                render_question(n, q)
+    waiting.append(job_id)
+elif job:
+    st.session_state["active_job"] = None
+    st.session_state["seen_job"]   = job_id
+    payload     = queue.get(job_id, with_payload=True)["payload"]
+    graded_with = (payload.get("cascade_model") or payload["model"], payload["strictness"], payload["segmented"])
+    if job["status"] != "done":
+        st.error(f"❌ {job['error'] or 'Evaluation ' + job['status']}")
+    elif job["kind"] == "evaluate_class":
+        st.session_state["class_results"] = (payload["names"], job["result"]["results"], job["result"]["elapsed"],
+                                              graded_with)
+        st.session_state.pop("class_report", None)
+    elif "error" in job["result"]:
+        st.error(f"❌ {job['result']['error']}")
+    else:
+        st.session_state["last_result"] = (job["result"], graded_with, payload["question_text"], payload["answer_text"])
+
+# While a job runs its progress (above) stands in for the previous result
+active = st.session_state.get("active_job")
+if input_mode == "👥 Class Mode":
+    if not active and "class_results" in st.session_state:
+        render_class(*st.session_state["class_results"])
+elif not active and "last_result" in st.session_state:
+    # Sidebar tweaks rerun the script: re-derive marks from the stored similarity scores instead of regrading
+    last, graded_with, last_q, last_a = st.session_state["last_result"]
+    stale_notice(graded_with)
+    if (question_text, answer_text) != (last_q, last_a) and (question_text or answer_text):
+        st.info("📝 Inputs changed since this evaluation — click Evaluate to grade the new sheet.")
+    render_result(rescore(last, partial_credit))
+
+def render_timings():
+    snap = telemetry.snapshot()
+    st.markdown("---\n### ⏱️ Timings")
+    st.caption(f"Since the server started {snap['uptime_s'] / 60:.0f} min ago · spans overlap, "
+               f"so nested ones (e.g. llm.call inside evaluate) are also counted in their parents")
+    if not snap["spans"] and not snap["counters"]:
+        st.info("Nothing measured yet — extract or grade something first.")
+        return
+    st.dataframe([{
+        "Span":    s["span"],
+        "Labels":  " ".join(f"{k}={v}" for k, v in s["labels"].items()),
+        "Count":   s["count"],
+        "Total s": s["total_s"],
+        "Mean ms": round(s["mean_s"] * 1000, 1),
+        "p95 ms":  round(s["p95_s"] * 1000, 1),
+        "Max ms":  round(s["max_s"] * 1000, 1),
+        "Errors":  s["errors"],
+    } for s in snap["spans"]], use_container_width=True, hide_index=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("#### 🔁 Fallbacks, retries & counters")
+        st.dataframe([{"Counter": c["counter"], "Labels": " ".join(f"{k}={v}" for k, v in c["labels"].items()),
+                       "Value": c["value"]} for c in snap["counters"]], use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown("#### 🧵 Latest spans")
+        st.dataframe([{"Span": t["span"], "Parent": t["parent"] or "", "ms": round(t["duration_s"] * 1000, 1),
+                       "Thread": t["thread"], "Error": t["error"] or ""} for t in reversed(snap["recent"][-50:])],
+                     use_container_width=True, hide_index=True)
+    c1, c2, c3 = st.columns(3)
+    c1.download_button("⬇️ metrics.json", telemetry.to_json(indent=2), "metrics.json", "application/json")
+    c2.download_button("⬇️ metrics.prom", telemetry.to_prometheus(), "metrics.prom", "text/plain")
+    if c3.button("🧹 Reset timings"):
+        telemetry.reset()
+        st.rerun()
+
+if show_timings:
+    render_timings()
+
+# Poll: rerun until every background job this page is waiting on has finished
+if waiting:
+    time.sleep(POLL_S)
+    st.rerun()
@@ -0,0 +1,216 @@
+"""
+Local stand-in for Groq's OpenAI-compatible chat-completions endpoint.
+
+    server = MockGroqServer(latency=0.4, jitter=0.2, error_rate=0.01, rate_limit_rate=0.05)
+    server.start()                       # sets GROQ_BASE_URL so new Groq clients hit it
+    ...
+    server.stop()
+
+Responses are canned but shaped by the prompt, so every evaluator path parses them:
+whole-sheet prompts get one entry per "Qn [m marks]" line, single-question prompts
+get one grade, and image (Vision OCR) prompts get a transcription of the sample sheet.
+Run standalone with `python -m benchmarks.mock_groq --port 8765`.
+"""
+import argparse, json, os, random, re, threading, time, uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE         = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_SHEET = os.path.join(HERE, os.pardir, "sample_answer_sheet.txt")
+
+
+def _canned_transcription():
+    try:
+        with open(SAMPLE_SHEET, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return "Q1. Sample answer."
+
+
+def _grade(number, rng):
+    return {
+        "question_number":    number,
+        "student_answer":     f"Student answer to question {number}.",
+        "similarity_score":   rng.randint(0, 100),
+        "feedback":           "Covers the main idea but lacks an example.",
+        "key_points_covered": ["definition"],
+        "missing_points":     ["example"],
+    }
+
+
+def canned_reply(messages, rng):
+    """Build a plausible completion for the evaluator / OCR prompt in `messages`."""
+    content = messages[-1].get("content", "") if messages else ""
+    if isinstance(content, list):
+        return _canned_transcription()
+
+    if "grading ONE student answer" in content:
+        grade = _grade(1, rng)
+        return json.dumps({k: grade[k] for k in ("similarity_score", "feedback", "key_points_covered", "missing_points")})
+
+    numbers = [int(n) for n in re.findall(r"^Q(\d+) \[", content, re.MULTILINE)] or [1, 2, 3]
+    return json.dumps({
+        "overall_feedback": "A reasonable attempt overall; several answers need more depth.",
+        "questions":        [dict(_grade(n, rng), question=f"Question {n}", max_marks=5) for n in numbers],
+    })
+
+
+class MockGroqServer:
+    """
+    Threaded HTTP server answering POST /openai/v1/chat/completions.
+
+    latency / jitter   seconds of simulated model time (uniform ± jitter)
+    error_rate         fraction of requests answered with HTTP 500
+    rate_limit_rate    fraction answered with HTTP 429 (+ Retry-After: retry_after)
+    reply              optional callable(messages, rng) -> str overriding canned_reply
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.3, jitter=0.1, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=0.05, reply=None, seed=0):
+        self.latency         = latency
+        self.jitter          = jitter
+        self.error_rate      = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after     = retry_after
+        self.reply           = reply or canned_reply
+        self.counts          = {"requests": 0, "errors": 0, "rate_limited": 0}
+        self._rng            = random.Random(seed)
+        self._lock           = threading.Lock()
+        self._httpd          = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread         = None
+        self._saved_env      = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, set_env=True):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        if set_env:
+            self._saved_env = os.environ.get("GROQ_BASE_URL")
+            os.environ["GROQ_BASE_URL"] = self.url
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._saved_env is None:
+            os.environ.pop("GROQ_BASE_URL", None)
+        else:
+            os.environ["GROQ_BASE_URL"] = self._saved_env
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _roll(self):
+        """Pick this request's fate and delay under the lock (random.Random is not thread-safe)."""
+        with self._lock:
+            self.counts["requests"] += 1
+            r     = self._rng.random()
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            if r < self.rate_limit_rate:
+                self.counts["rate_limited"] += 1
+                return 429, 0.0
+            if r < self.rate_limit_rate + self.error_rate:
+                self.counts["errors"] += 1
+                return 500, delay
+            return 200, delay
+
+
+def _make_handler(server):
+    """Request handler class bound to one MockGroqServer."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length  = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+            status, delay = server._roll()
+            time.sleep(delay)
+            if status == 429:
+                return self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                                       {"Retry-After": str(server.retry_after)})
+            if status == 500:
+                return self._send_json(500, {"error": {"message": "Internal server error", "type": "internal_error"}})
+
+            with server._lock:
+                content = server.reply(request.get("messages", []), server._rng)
+            model   = request.get("model", "mock")
+            prompt  = len(json.dumps(request.get("messages", []))) // 4
+            usage   = {"prompt_tokens": prompt, "completion_tokens": len(content) // 4,
+                       "total_tokens": prompt + len(content) // 4}
+            ident   = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+
+            if request.get("stream"):
+                return self._stream(ident, created, model, content, usage)
+            self._send_json(200, {
+                "id": ident, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def _stream(self, ident, created, model, content, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            step = 16
+            for i in range(0, len(content), step):
+                chunk = {"id": ident, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            final = {"id": ident, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                     "x_groq": {"usage": usage}}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Run a local mock of the Groq chat-completions API.")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.3)
+    p.add_argument("--jitter", type=float, default=0.1)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = p.parse_args(argv)
+
+    server = MockGroqServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    server.start(set_env=False)
+    print(f"Mock Groq listening on {server.url} — export GROQ_BASE_URL={server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
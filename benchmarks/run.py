@@ -0,0 +1,200 @@
+"""
+Throughput / latency benchmarks for the grading, OCR and report paths, run
+entirely against benchmarks.mock_groq — no Groq key or network needed.
+
+    python -m benchmarks.run                          # everything, default sizes
+    python -m benchmarks.run --only evaluate --sizes 1,50,500 --latency 0.5 --rate-limit-rate 0.05
+    python -m benchmarks.run --json bench.json        # machine-readable results for CI diffs
+
+Each scenario prints sheets (or pages), wall time, throughput and p50/p95/p99
+per-item latency.  Local caches and the client-side rate limiter are disabled so
+every item really exercises the code path being measured.
+"""
+import argparse, json, math, os, statistics, sys, tempfile, time
+
+ROOT      = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+PDFS      = [os.path.join(ROOT, "Handwritten .pdf"), os.path.join(ROOT, "Handwritten 1.pdf")]
+MODEL     = "llama-3.3-70b-versatile"
+OCR_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+API_KEY   = "mock-bench-key"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; `values` need not be sorted."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank    = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarise(name, size, wall, latencies, errors=0):
+    return {
+        "scenario":   name,
+        "items":      size,
+        "wall_s":     round(wall, 3),
+        "throughput": round(size / wall, 2) if wall else 0.0,
+        "p50_s":      round(percentile(latencies, 50), 3),
+        "p95_s":      round(percentile(latencies, 95), 3),
+        "p99_s":      round(percentile(latencies, 99), 3),
+        "mean_s":     round(statistics.mean(latencies), 3) if latencies else 0.0,
+        "errors":     errors,
+    }
+
+
+def print_row(row):
+    print(f"{row['scenario']:<22} {row['items']:>5}  {row['wall_s']:>8.2f}s  {row['throughput']:>8.2f}/s  "
+          f"p50 {row['p50_s']:>6.3f}  p95 {row['p95_s']:>6.3f}  p99 {row['p99_s']:>6.3f}  err {row['errors']}")
+
+
+# ── Scenarios ─────────────────────────────────────────────────────────────────
+
+def bench_evaluate(sizes, workers, segmented=False, cascade=False):
+    from evaluator import FAST_MODEL, AnswerEvaluator
+
+    with open(os.path.join(ROOT, "sample_question_paper.txt"), encoding="utf-8") as f:
+        paper = f.read()
+    with open(os.path.join(ROOT, "sample_answer_sheet.txt"), encoding="utf-8") as f:
+        sheet = f.read()
+
+    name      = "evaluate_cascade" if cascade else "evaluate_segmented" if segmented else "evaluate"
+    evaluator = AnswerEvaluator(API_KEY, FAST_MODEL if cascade else MODEL, use_cache=False, segmented=segmented,
+                                cascade_model=MODEL if cascade else None)
+    rows = []
+    for size in sizes:
+        # Distinct sheets so nothing downstream can short-circuit on identical input
+        sheets  = [f"{sheet}\nRoll No: {i}" for i in range(size)]
+        start   = time.perf_counter()
+        results = evaluator.evaluate_batch(paper, sheets, max_workers=workers)
+        wall    = time.perf_counter() - start
+        rows.append(summarise(name, size, wall, [r.get("elapsed", 0) for r in results],
+                              sum(1 for r in results if "error" in r)))
+    return rows
+
+
+def bench_ocr(repeats):
+    import utils
+
+    rows = []
+    for path in PDFS:
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        for _ in range(repeats):
+            cache = utils.get_ocr_cache()
+            if cache:
+                cache.clear()
+            t0   = time.perf_counter()
+            text = utils.extract_text_from_pdf(utils.Upload(data, "application/pdf"), api_key=API_KEY)
+            latencies.append(time.perf_counter() - t0)
+            errors += text.startswith("[")
+        rows.append(summarise(f"ocr:{os.path.basename(path)}", repeats, time.perf_counter() - start, latencies, errors))
+    return rows
+
+
+def bench_report(sizes, batched=False):
+    from question_paper import QuestionPaper
+    from utils import generate_pdf_report, iter_pdf_reports
+
+    with open(os.path.join(ROOT, "sample_question_paper.txt"), encoding="utf-8") as f:
+        paper = QuestionPaper.parse(f.read())
+    result = {
+        "total_earned": 21.5, "total_max": paper.total_marks, "grade": "B", "grade_name": "Good",
+        "overall_feedback": "A reasonable attempt overall; several answers need more depth.",
+        "questions": [{
+            "question_number": q.number, "question": q.text, "max_marks": q.max_marks,
+            "student_answer": "Student answer.", "earned": q.max_marks * 0.7, "similarity_score": 70,
+            "feedback": "Covers the main idea but lacks an example.",
+            "key_points_covered": ["definition"], "missing_points": ["example"],
+        } for q in paper.questions],
+    }
+
+    rows = []
+    for size in sizes:
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        if batched:
+            # Latency here is time between consecutive PDFs arriving from the pool
+            t0 = start
+            for pdf in iter_pdf_reports([result] * size, MODEL, "Moderate"):
+                errors += pdf is None
+                latencies.append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+        else:
+            for _ in range(size):
+                t0 = time.perf_counter()
+                errors += generate_pdf_report(result, MODEL, "Moderate") is None
+                latencies.append(time.perf_counter() - t0)
+        rows.append(summarise("report_batch" if batched else "report", size,
+                              time.perf_counter() - start, latencies, errors))
+    return rows
+
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark SmartGrade AI against a local mock Groq server.")
+    p.add_argument("--only", default="evaluate,segmented,cascade,ocr,report,report_batch",
+                   help="comma-separated scenarios: evaluate, segmented, cascade, ocr, report, report_batch")
+    p.add_argument("--sizes", default="1,10,100,500", help="sheet counts for evaluate / report")
+    p.add_argument("--workers", type=int, default=8, help="evaluate_batch concurrency")
+    p.add_argument("--ocr-repeats", type=int, default=3, help="extractions per bundled PDF")
+    p.add_argument("--latency", type=float, default=0.3, help="mock model latency (s)")
+    p.add_argument("--jitter", type=float, default=0.1, help="± latency jitter (s)")
+    p.add_argument("--error-rate", type=float, default=0.0, help="fraction of HTTP 500 responses")
+    p.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of HTTP 429 responses")
+    p.add_argument("--json", help="also write results to this JSON file")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args  = parse_args(argv)
+    only  = {s.strip() for s in args.only.split(",") if s.strip()}
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    # Throwaway cache dir so benchmarks never read or pollute real caches
+    os.environ["SMARTGRADE_CACHE_DIR"] = tempfile.mkdtemp(prefix="smartgrade-bench-")
+
+    from benchmarks.mock_groq import MockGroqServer
+    import groq_client, telemetry
+    from evaluator import FAST_MODEL
+    for model in (MODEL, FAST_MODEL, OCR_MODEL):
+        groq_client.set_rate_limit(model, None, None)
+
+    server = MockGroqServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            rate_limit_rate=args.rate_limit_rate).start()
+    rows = []
+    try:
+        scenarios = [
+            ("evaluate",  lambda: bench_evaluate(sizes, args.workers)),
+            ("segmented", lambda: bench_evaluate(sizes, args.workers, segmented=True)),
+            ("cascade",   lambda: bench_evaluate(sizes, args.workers, cascade=True)),
+            ("ocr",       lambda: bench_ocr(args.ocr_repeats)),
+            ("report",    lambda: bench_report(sizes)),
+            ("report_batch", lambda: bench_report(sizes, batched=True)),
+        ]
+        for name, run in scenarios:
+            if name not in only:
+                continue
+            try:
+                for row in run():
+                    print_row(row)
+                    rows.append(row)
+            except ImportError as e:
+                print(f"{name:<22} skipped — {e}")
+    finally:
+        server.stop()
+
+    print(f"mock server: {server.counts}   client: {groq_client.stats()}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": rows, "server": server.counts,
+                       "client": groq_client.stats(), "telemetry": telemetry.snapshot(recent=False)}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
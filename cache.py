@@ -0,0 +1,154 @@
+import json, os, sqlite3, threading, time
+from collections import OrderedDict
+
+
+# ── Cache location ────────────────────────────────────────────────────────────
+
+def default_cache_path(name):
+    """
+    Path of a cache database under $SMARTGRADE_CACHE_DIR
+    (defaults to ~/.cache/smartgrade).
+    """
+    root = os.environ.get("SMARTGRADE_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "smartgrade")
+    return os.path.join(root, f"{name}.sqlite3")
+
+
+# ── Persistent LRU store ──────────────────────────────────────────────────────
+
+class DiskCache:
+    """
+    Persistent key → value store backed by a single SQLite file.
+    Values must be JSON-serialisable.  When the stored payload grows past
+    `max_bytes` the least-recently-read entries are evicted.  One instance can be
+    shared between threads; `hits` / `misses` count lookups since it was opened.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path      = path
+        self.max_bytes = max_bytes
+        self.hits      = 0
+        self.misses    = 0
+        self._lock     = threading.Lock()
+        self._conn     = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key      TEXT PRIMARY KEY,
+            value    TEXT NOT NULL,
+            size     INTEGER NOT NULL,
+            accessed REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        blob = json.dumps(value)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                               (key, blob, len(blob), time.time()))
+            self._size += len(blob) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least-recently-read entries until the store fits in max_bytes.  Caller holds the lock."""
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if self._size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": self._size}
+
+
+# ── In-memory LRU store ───────────────────────────────────────────────────────
+
+class MemoryCache:
+    """
+    Thread-safe in-process LRU with the same get / set / stats interface as
+    DiskCache.  Holds at most `max_entries` values; stored objects are not
+    copied, so callers should not mutate what they put in or get out.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits        = 0
+        self.misses      = 0
+        self._lock       = threading.Lock()
+        self._entries    = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+# ── Tiered store ──────────────────────────────────────────────────────────────
+
+class TieredCache:
+    """
+    Chain of caches checked fastest-first, e.g. TieredCache(MemoryCache(), DiskCache(path)).
+    A hit in a slower tier is copied into the faster ones; writes go to every tier.
+    """
+
+    def __init__(self, *tiers):
+        self.tiers = [t for t in tiers if t is not None]
+
+    def get(self, key, default=None):
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, value)
+                return value
+        return default
+
+    def set(self, key, value):
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+        return [tier.stats() for tier in self.tiers]
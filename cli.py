@@ -0,0 +1,219 @@
+"""
+Headless batch grader.
+
+    python cli.py --questions paper.pdf --answers submissions/ --out results/
+
+Extracts and grades every answer sheet in a directory concurrently, then reports.
+Results are appended to <out>/results.jsonl as each sheet finishes and PDF reports
+go to <out>/reports/ (rendered across a process pool once grading finishes, with
+--class-report adding one combined <out>/class_report.pdf).  Re-running with the same --out resumes: sheets that already
+have a successful result are skipped, failed ones are retried.
+"""
+import argparse, json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import telemetry
+from evaluator import CASCADE_BAND, AnswerEvaluator, batch_usage
+from groq_client import parse_rate_limits, set_rate_limit
+from prescore import DEFAULT_THRESHOLD
+from question_paper import QuestionPaper
+from results_store import get_results_store
+from utils import Upload, read_file, iter_pdf_reports, generate_class_report
+
+SUPPORTED = {".pdf", ".png", ".jpg", ".jpeg", ".txt"}
+
+
+def get_grade(pct, thresholds):
+    for threshold, letter, name in zip(thresholds, "ABCD", ["Excellent", "Good", "Average", "Pass"]):
+        if pct >= threshold: return letter, name
+    return "F", "Fail"
+
+
+def load_results(path):
+    """{file name: result} for every sheet with a successful result in results.jsonl."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue                  # torn last line from an interrupted run
+            if "error" not in record.get("result", {"error": None}):
+                done[record["file"]] = record["result"]
+    return done
+
+
+def load_checkpoint(path):
+    """File names that already have a successful result in results.jsonl."""
+    return set(load_results(path))
+
+
+def report_path(report_dir, name):
+    return os.path.join(report_dir, os.path.splitext(name)[0] + ".pdf")
+
+
+def model_label(args):
+    """Model name shown in reports and the analytics store."""
+    return f"{args.model} → {args.cascade_model}" if args.cascade_model else args.model
+
+
+def write_reports(results, report_dir, args):
+    """Render the per-student PDFs that are not on disk yet, in a process pool."""
+    missing = sorted(name for name in results if not os.path.exists(report_path(report_dir, name)))
+    if not missing:
+        return
+    start = time.perf_counter()
+    pdfs  = iter_pdf_reports([results[name] for name in missing], model_label(args), args.strictness,
+                             [os.path.splitext(name)[0] for name in missing], args.report_workers)
+    written = 0
+    for name, pdf in zip(missing, pdfs):
+        if pdf:
+            with open(report_path(report_dir, name), "wb") as f:
+                f.write(pdf)
+            written += 1
+    print(f"{written}/{len(missing)} PDF reports written in {time.perf_counter() - start:.1f}s: {report_dir}")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Grade a directory of answer sheets against one question paper.")
+    p.add_argument("--questions", required=True, help="question paper (.pdf / image / .txt)")
+    p.add_argument("--answers",   required=True, help="directory of answer sheets")
+    p.add_argument("--out",       default="results", help="output directory (default: results)")
+    p.add_argument("--api-key",   default=os.environ.get("GROQ_API_KEY"), help="Groq API key (default: $GROQ_API_KEY)")
+    p.add_argument("--model",     default="llama-3.3-70b-versatile")
+    p.add_argument("--cascade-model", help="re-grade questions --model is unsure about with this (larger) model")
+    p.add_argument("--cascade-band", default=f"{CASCADE_BAND[0]},{CASCADE_BAND[1]}",
+                   help="first-pass similarity range that counts as unsure (default: %(default)s)")
+    p.add_argument("--strictness", default="Moderate", choices=list(AnswerEvaluator.STRICTNESS_RULES))
+    p.add_argument("--no-partial-credit", action="store_true")
+    p.add_argument("--segmented", action="store_true", help="grade each question as its own request")
+    p.add_argument("--no-prescore", action="store_true", help="send blank answers to the LLM too")
+    p.add_argument("--skip-off-topic", type=float, nargs="?", const=DEFAULT_THRESHOLD, metavar="CONFIDENCE",
+                   help="also zero-score very short answers sharing no words with their question, without the LLM "
+                        f"(confidence default: {DEFAULT_THRESHOLD}; may zero correct one-word answers)")
+    p.add_argument("--workers",   type=int, default=4, help="answer sheets processed concurrently (default: 4)")
+    p.add_argument("--rate-limit", type=parse_rate_limits, metavar="[MODEL=]RPM/TPM[,...]",
+                   help="Groq quota of your key, e.g. 1000/300000 for every model ('-' = no limit; "
+                        "default: free-tier quotas, or $SMARTGRADE_RATE_LIMITS)")
+    p.add_argument("--grades",    default="85,70,55,40", help="A,B,C,D percentage thresholds")
+    p.add_argument("--no-reports", action="store_true", help="skip per-student PDF reports")
+    p.add_argument("--class-report", action="store_true", help="also write one combined <out>/class_report.pdf")
+    p.add_argument("--report-workers", type=int, default=None,
+                   help="processes rendering PDF reports (default: one per CPU)")
+    p.add_argument("--no-cache",  action="store_true", help="always call Groq, ignoring cached evaluations")
+    p.add_argument("--no-store",  action="store_true", help="don't save results to the analytics store")
+    p.add_argument("--metrics",   help="write timing spans and counters here at the end (*.prom: Prometheus text, "
+                                       "else JSON)")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.api_key:
+        print("error: pass --api-key or set GROQ_API_KEY", file=sys.stderr)
+        return 2
+    thresholds = [float(t) for t in args.grades.split(",")]
+    for model, (rpm, tpm) in (args.rate_limit or {}).items():
+        set_rate_limit(model, rpm, tpm)
+
+    sheets = sorted(
+        os.path.join(args.answers, name) for name in os.listdir(args.answers)
+        if os.path.splitext(name)[1].lower() in SUPPORTED
+    )
+    report_dir = os.path.join(args.out, "reports")
+    os.makedirs(report_dir, exist_ok=True)
+    results_path = os.path.join(args.out, "results.jsonl")
+
+    done = load_checkpoint(results_path)
+    todo = [path for path in sheets if os.path.basename(path) not in done]
+    print(f"{len(sheets)} answer sheets, {len(done)} already graded, {len(todo)} to go")
+    failed = 0
+    if todo:
+        failed = grade(todo, results_path, thresholds, args)
+
+    on_disk = {os.path.basename(path) for path in sheets}
+    results = {name: r for name, r in load_results(results_path).items() if name in on_disk}
+    if not args.no_reports:
+        write_reports(results, report_dir, args)
+    if args.class_report and results:
+        names      = sorted(results)
+        class_path = generate_class_report([results[n] for n in names], [os.path.splitext(n)[0] for n in names],
+                                           model_label(args), args.strictness, path=os.path.join(args.out, "class_report.pdf"),
+                                           max_workers=args.report_workers)
+        print(f"Class report: {class_path or 'FAILED'}")
+    if args.metrics:
+        telemetry.write(args.metrics)
+        print(f"Metrics: {args.metrics}")
+    return 1 if failed else 0
+
+
+def grade(todo, results_path, thresholds, args):
+    """Grade `todo` concurrently, appending each record to results.jsonl.  Returns the failure count."""
+    paper = QuestionPaper.parse(read_file(Upload.from_path(args.questions), api_key=args.api_key))
+    print(f"Question paper: {len(paper.questions)} questions, {paper.total_marks} marks")
+
+    evaluator = AnswerEvaluator(args.api_key, args.model, args.strictness, not args.no_partial_credit,
+                                use_cache=not args.no_cache, segmented=args.segmented,
+                                prescore=not args.no_prescore, prescore_threshold=args.skip_off_topic,
+                                cascade_model=args.cascade_model,
+                                cascade_band=[float(b) for b in args.cascade_band.split(",")])
+    store      = None if args.no_store else get_results_store()
+    write_lock = threading.Lock()
+
+    def process(path):
+        name  = os.path.basename(path)
+        start = time.perf_counter()
+        try:
+            result = evaluator.evaluate(paper, read_file(Upload.from_path(path), api_key=args.api_key))
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        if "error" not in result:
+            te, tm = result.get("total_earned", 0), result.get("total_max", 0)
+            result["grade"], result["grade_name"] = get_grade((te / tm * 100) if tm else 0, thresholds)
+            if store:
+                store.record(paper, result, os.path.splitext(name)[0], model=model_label(args),
+                             strictness=args.strictness)
+        record = {"file": name, "elapsed": round(time.perf_counter() - start, 2), "result": result}
+        with write_lock, open(results_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return record
+
+    start   = time.perf_counter()
+    failed  = 0
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(process, path) for path in todo]
+        for n, fut in enumerate(as_completed(futures), 1):
+            record = fut.result()
+            result = record["result"]
+            results.append(result)
+            if "error" in result:
+                failed += 1
+                summary = f"ERROR {result['error']}"
+            else:
+                summary = f"{result['total_earned']}/{result['total_max']} ({result['grade']})"
+            print(f"[{n}/{len(todo)}] {record['file']}: {summary}  {record['elapsed']}s")
+
+    print(f"Done in {time.perf_counter() - start:.1f}s — {len(todo) - failed} graded, {failed} failed "
+          f"(re-run to retry). Results: {results_path}")
+    if args.cascade_model:
+        escalated = sum(len(r.get("escalated_questions", [])) for r in results)
+        answered  = sum(len(r.get("questions", [])) for r in results)
+        print(f"  {escalated}/{answered} questions re-graded with {args.cascade_model}")
+    usage = batch_usage(results)
+    for model, part in usage["by_model"].items():
+        print(f"  {model}: {part['calls']} calls, {part['prompt_tokens']:,} prompt + "
+              f"{part['completion_tokens']:,} completion tokens, {part['latency_s']:.1f}s model time, "
+              f"≈${part['cost_usd']:.4f}")
+    if usage["sheets"]:
+        print(f"  per sheet: {usage['per_sheet']['total_tokens']:,.0f} tokens, "
+              f"{usage['per_sheet']['latency_s']:.1f}s model time, ≈${usage['per_sheet']['cost_usd']:.4f}")
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
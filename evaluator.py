@@ -1,5 +1,147 @@
-import json, re
-from groq import Groq
+import copy, dataclasses, hashlib, json, os, re, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import telemetry
+from groq_client import UsageMeter, chat_completion, empty_usage, estimate_tokens, get_client, merge_usage, request_budget
+from cache import DiskCache, MemoryCache, TieredCache, default_cache_path
+from question_paper import QuestionPaper, segment_answers
+from prescore import Prescorer, is_blank
+
+PROMPT_VERSION = 4          # bump whenever the evaluation prompt or scoring changes
+
+_result_cache      = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Process-wide evaluation cache shared by every AnswerEvaluator: an in-memory
+    LRU, backed by a SQLite tier when $SMARTGRADE_EVAL_CACHE_DISK=1.
+    """
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            disk = None
+            if os.environ.get("SMARTGRADE_EVAL_CACHE_DISK") == "1":
+                try:
+                    disk = DiskCache(default_cache_path("evaluations"))
+                except Exception as e:
+                    print(f"[Evaluation cache warning]: {e}")
+            _result_cache = TieredCache(MemoryCache(512), disk)
+        return _result_cache
+
+
+FULL_CREDIT_AT = 70         # similarity needed for full marks when partial credit is off
+
+# Expected size of the whole-sheet JSON reply, used to size max_tokens and to chunk long sheets
+OUTPUT_TOKENS_BASE         = 200    # overall_feedback + JSON framing
+OUTPUT_TOKENS_PER_QUESTION = 150    # feedback + key points for one question, besides the echoed answer
+MIN_OUTPUT_TOKENS          = 1024
+
+# Model cascade: a fast first pass, with uncertain questions re-graded by a larger model
+FAST_MODEL   = "llama-3.1-8b-instant"
+CASCADE_BAND = (35, 75)     # first-pass similarity scores (inclusive) that count as uncertain
+
+NO_ANSWER_FEEDBACK = "No answer found for this question."
+
+PRESCORE_FEEDBACK = {
+    "blank":     NO_ANSWER_FEEDBACK,
+    "off_topic": "Answer does not address the question.",
+}
+
+
+def _tokens(text):
+    return estimate_tokens([{"role": "user", "content": text or ""}])
+
+
+def batch_usage(results):
+    """
+    Add up the "usage" of many results (e.g. from evaluate_batch): token, latency
+    and cost totals, the per-model split, and per-sheet averages.
+    """
+    usages = [r.get("usage") for r in results if r and r.get("usage")]
+    total  = merge_usage(usages)
+    total["sheets"]    = len(usages)
+    total["per_sheet"] = {k: round(total[k] / len(usages), 6 if k == "cost_usd" else 3) if usages else 0
+                          for k in ("total_tokens", "latency_s", "cost_usd")}
+    return total
+
+
+def marks_for(similarity, max_marks, partial_credit=True):
+    if partial_credit:
+        return round((similarity / 100) * max_marks, 1)
+    return max_marks if similarity >= FULL_CREDIT_AT else 0
+
+
+def rescore(result, partial_credit=True):
+    """
+    Re-derive per-question and total marks from a result's stored similarity
+    scores, without calling Groq.  Toggling partial credit (or moving grade
+    thresholds, which apply to the percentage) never needs a new evaluation —
+    only a strictness or model change does.  Returns a new dict.
+    """
+    if "error" in result:
+        return result
+    result = copy.deepcopy(result)
+    qs     = result.get("questions", [])
+    for q in qs:
+        q["earned"] = marks_for(q.get("similarity_score", 0), q.get("max_marks", 5), partial_credit)
+    result["total_max"]    = sum(q.get("max_marks", 5) for q in qs)
+    result["total_earned"] = round(sum(q["earned"] for q in qs), 1)
+    return result
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def _question_number(value):
+    """Question number from a model reply: 3, "3", "Q3" or "Question 3".  None if it has none."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    match = re.search(r"\d+", str(value)) if value is not None else None
+    return int(match.group()) if match else None
+
+
+class _QuestionStream:
+    """
+    Incremental scanner over a streamed JSON response.  feed() returns every
+    object that has just been closed inside a top-level array — i.e. each entry
+    of "questions" — as soon as its final brace arrives.
+    """
+
+    def __init__(self):
+        self.buf      = []
+        self.stack    = []
+        self.start    = None
+        self.in_str   = False
+        self.escaped  = False
+
+    def feed(self, text):
+        done = []
+        for ch in text:
+            if self.start is not None:
+                self.buf.append(ch)
+            if self.in_str:
+                if self.escaped:      self.escaped = False
+                elif ch == "\\":     self.escaped = True
+                elif ch == '"':       self.in_str  = False
+                continue
+            if ch == '"':
+                self.in_str = True
+            elif ch in "{[":
+                if ch == "{" and self.stack == ["{", "["]:
+                    self.start, self.buf = len(self.stack), ["{"]
+                self.stack.append(ch)
+            elif ch in "}]" and self.stack:
+                self.stack.pop()
+                if ch == "}" and self.start is not None and len(self.stack) == self.start:
+                    try:
+                        done.append(json.loads("".join(self.buf)))
+                    except ValueError:
+                        pass
+                    self.start, self.buf = None, []
+        return done
+
 
 class AnswerEvaluator:
     STRICTNESS_RULES = {
@@ -24,21 +166,289 @@ class AnswerEvaluator:
 - Give 0-20% for incomplete or incorrect answers"""
     }
 
-    def __init__(self, api_key, model="llama-3.3-70b-versatile", strictness="Moderate", partial_credit=True):
-        self.client         = Groq(api_key=api_key)
-        self.model          = model
-        self.strictness     = strictness
-        self.partial_credit = partial_credit
+    def __init__(self, api_key, model="llama-3.3-70b-versatile", strictness="Moderate", partial_credit=True,
+                 cache=None, use_cache=True, segmented=False, question_workers=4, retries=2,
+                 prescore=True, prescore_threshold=None, cascade_model=None, cascade_band=CASCADE_BAND):
+        """
+        `cache` is any object with get(key) / set(key, value) (see cache.py); it defaults
+        to the shared get_result_cache().  Set use_cache=False to always call Groq.
+
+        With segmented=True each question is graded by its own small request
+        (up to `question_workers` in parallel) and only failed questions are
+        retried, up to `retries` more times.
+
+        With prescore=True, blank answers (empty, "[?]", "N/A", "I don't know")
+        get 0 without an LLM call.  A `prescore_threshold` (e.g.
+        prescore.DEFAULT_THRESHOLD) also zero-scores very short answers that
+        share no vocabulary with their question (see prescore.Prescorer); it is
+        off by default because it cannot recognise a correct one-word answer.
+        Pass prescore=False to send every answer to the model.
+
+        With `cascade_model` set, `model` (typically FAST_MODEL) grades first and
+        only the questions it scores inside `cascade_band`, or fails to grade,
+        are re-graded by `cascade_model`; see _escalate.
+        """
+        self.client             = get_client(api_key)
+        self.model              = model
+        self.strictness         = strictness
+        self.partial_credit     = partial_credit
+        self.cache              = cache if cache is not None else get_result_cache()
+        self.use_cache          = use_cache
+        self.segmented          = segmented
+        self.q_workers          = question_workers
+        self.retries            = retries
+        self.prescore           = prescore
+        self.prescore_threshold = prescore_threshold
+        self.cascade_model      = cascade_model
+        self.cascade_band       = tuple(cascade_band)
+
+    def cache_key(self, question_paper, answer_sheet):
+        """Stable hash of everything that determines the evaluation output."""
+        paper   = QuestionPaper.coerce(question_paper)
+        # partial_credit is deliberately absent: marks are re-derived locally (see rescore)
+        payload = json.dumps([PROMPT_VERSION, self.model, self.strictness, bool(self.segmented),
+                              bool(self.prescore), self.prescore_threshold, self.cascade_model, self.cascade_band if self.cascade_model else None,
+                              _normalize(paper.text), _normalize(answer_sheet)])
+        return "eval:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
     def evaluate(self, question_paper, answer_sheet):
-        partial_note = "Award partial marks proportionally based on similarity score." if self.partial_credit else "Award FULL marks if similarity ≥ 70%, otherwise give ZERO."
-        
-        prompt = f"""You are an expert examiner evaluating student answers.
+        """
+        Grade one answer sheet.  `question_paper` may be raw text or a QuestionPaper;
+        raw text is parsed (and memoised) locally so the marks scheme is identical
+        for every student.  The result's "usage" holds the Groq calls it took:
+        tokens, wall time and estimated cost, per model (all zero on a cache hit).
+        """
+        paper = QuestionPaper.coerce(question_paper)
+        if self.use_cache:
+            key = self.cache_key(paper, answer_sheet)
+            hit = self.cache.get(key)
+            if hit is not None:
+                telemetry.count("evaluate.cache_hits")
+                return dict(rescore(hit, self.partial_credit), cached=True, usage=empty_usage())
+
+        meter = UsageMeter()
+        with telemetry.span("evaluate", mode=self._mode):
+            local, rest, sheet = self._prescore(paper, answer_sheet)
+            if rest is None:
+                result = {"questions": []}
+            else:
+                result = self._escalate(self._first_pass(rest, sheet, meter), rest, sheet, meter)
+            if local:
+                result = self._merge_prescored(local, result, paper)
+        result["usage"] = meter.summary()
+        if self.use_cache and "error" not in result and not result.get("failed_questions"):
+            self.cache.set(key, copy.deepcopy(result))
+        return result
+
+    @property
+    def _mode(self):
+        """Span label for how sheets are graded."""
+        return ("segmented" if self.segmented else "whole") + ("+cascade" if self.cascade_model else "")
+
+    # ── Local pre-scoring ─────────────────────────────────────────────────────
+
+    @staticmethod
+    def _sheet_for(questions, answers):
+        """A numbered answer sheet holding only the answers to `questions`."""
+        return "\n\n".join(f"Q{q.number}. {answers[q.number]}" for q in questions if answers.get(q.number))
+
+    def _prescore(self, paper, answer_sheet):
+        """
+        Score blank (and, opt-in, off-topic) answers 0 locally.  Returns (local,
+        rest, sheet): the question dicts scored here, the paper reduced to what
+        still needs the LLM (None when nothing does) and the sheet to send with
+        it.  The sheet goes unchanged — a student's own numbered list can look
+        like question numbers, so rebuilding it could misattribute answers.
+        """
+        if not self.prescore or not paper.questions:
+            return [], paper, answer_sheet
+
+        answers = segment_answers(answer_sheet, paper)
+        skipped = {}
+        if not answers:
+            # Unnumbered sheet: answers can't be told apart, so only a wholly blank sheet is skipped
+            if is_blank(answer_sheet):
+                skipped = {q.number: ("blank", "") for q in paper.questions}
+        else:
+            scorer = Prescorer(paper, self.prescore_threshold)
+            for q in paper.questions:
+                # Questions missing from the numbering go to the LLM, which may still find the answer
+                assessment = scorer.skip(q, answers[q.number]) if q.number in answers else None
+                if assessment:
+                    skipped[q.number] = (assessment.kind, answers[q.number])
+        if not skipped:
+            return [], paper, answer_sheet
+
+        local = [self._score_one({"question_number": number, "student_answer": answer, "similarity_score": 0,
+                                  "feedback": PRESCORE_FEEDBACK[kind]}, paper)
+                 for number, (kind, answer) in skipped.items()]
+        remaining = [q for q in paper.questions if q.number not in skipped]
+        if not remaining:
+            return local, None, None
+        return local, dataclasses.replace(paper, questions=tuple(remaining)), answer_sheet
+
+    def _merge_prescored(self, local, result, paper):
+        """Fold locally scored questions back into a (partial) LLM result for the full paper."""
+        if "error" in result:
+            return result
+        data = self._score(dict(result, questions=result.get("questions", []) + local), paper)
+        if self.segmented or data.get("chunks") or not data.get("overall_feedback"):
+            data["overall_feedback"] = self._summary_feedback(data["questions"], data["total_earned"], data["total_max"])
+        data["prescored_questions"] = sorted(q["question_number"] for q in local)
+        telemetry.count("evaluate.prescored_questions", len(local))
+        return data
+
+    def _first_pass(self, paper, answer_sheet, meter=None):
+        if self.segmented and paper.questions:
+            return self._evaluate_segmented(paper, answer_sheet, meter)
+        return self._evaluate(paper, answer_sheet, meter)
+
+    # ── Model cascade ─────────────────────────────────────────────────────────
+
+    def _uncertain(self, q):
+        low, high = self.cascade_band
+        return bool(self.cascade_model) and low <= q.get("similarity_score", 0) <= high
+
+    def _escalate(self, result, paper, answer_sheet, meter=None):
+        """
+        Re-grade with cascade_model whatever the first pass left uncertain: the
+        questions scored inside cascade_band or listed in "failed_questions", or
+        the whole sheet when the first pass failed outright (e.g. its JSON did
+        not parse).  Re-graded questions replace the first-pass ones and are
+        listed under "escalated_questions"; if re-grading fails — or the second
+        reply leaves a question out — the first-pass grade stands.  Without numbered questions only failures are escalated.
+        """
+        if not self.cascade_model:
+            return result
+        large = copy.copy(self)
+        large.model, large.cascade_model = self.cascade_model, None
+
+        if "error" in result:
+            second = large._first_pass(paper, answer_sheet, meter)
+            if "error" in second:
+                return result
+            second["escalated_questions"] = sorted(q.get("question_number", i)
+                                                   for i, q in enumerate(second.get("questions", []), 1))
+            telemetry.count("evaluate.escalated_sheets", model=self.cascade_model)
+            return second
+        if not paper.questions:
+            return result
+
+        failed  = set(result.get("failed_questions", []))
+        numbers = [q["question_number"] for q in result["questions"]
+                   if q["question_number"] in failed or self._uncertain(q)]
+        if not numbers:
+            return result
+        # The whole sheet goes along (see _prescore); the prompt lists only the questions to re-grade
+        sub    = dataclasses.replace(paper, questions=tuple(paper.get(n) for n in numbers))
+        second = large._first_pass(sub, answer_sheet, meter)
+        if "error" in second:
+            return result
+
+        # A question the second reply skipped is aligned as unanswered; keep its first-pass grade instead
+        regraded = {q["question_number"]: q for q in second["questions"]
+                    if q["question_number"] not in second.get("failed_questions", [])
+                    and (q["student_answer"] or q["feedback"] != NO_ANSWER_FEEDBACK)}
+        data = self._score(dict(result, questions=[regraded.get(q["question_number"], q) for q in result["questions"]]),
+                           paper)
+        if self.segmented or data.get("chunks"):
+            data["overall_feedback"] = self._summary_feedback(data["questions"], data["total_earned"], data["total_max"])
+        data.pop("failed_questions", None)
+        if failed - set(regraded):
+            data["failed_questions"] = sorted(failed - set(regraded))
+        data["escalated_questions"] = sorted(regraded)
+        telemetry.count("evaluate.escalated_questions", len(regraded), model=self.cascade_model)
+        return data
+
+    # ── Request budgeting ─────────────────────────────────────────────────────
+
+    def _output_budget(self, n_questions, echoed_tokens):
+        """max_tokens for a whole-sheet reply: its expected size plus 25% headroom, within the model's cap."""
+        _, max_output = request_budget(self.model)
+        expected = OUTPUT_TOKENS_BASE + OUTPUT_TOKENS_PER_QUESTION * max(1, n_questions) + echoed_tokens
+        return min(max_output, max(MIN_OUTPUT_TOKENS, int(expected * 1.25)))
+
+    def _request(self, paper, answer_sheet, echoed_tokens):
+        """(prompt, max_tokens, estimated total tokens) for grading `paper` against `answer_sheet`."""
+        prompt     = self._build_prompt(paper, answer_sheet)
+        max_tokens = self._output_budget(len(paper.questions), echoed_tokens)
+        return prompt, max_tokens, _tokens(prompt) + max_tokens
+
+    def plan(self, question_paper, answer_sheet):
+        """
+        Split a whole-sheet evaluation into requests that fit the model's budget
+        (see groq_client.request_budget).  Returns [(paper, answer_sheet, prompt,
+        max_tokens)] — a single entry unless the sheet is too big for one request,
+        in which case each entry carries a subset of the questions and only the
+        answers to them.  A sheet without question numbers cannot be split, so
+        it stays one (over-budget) request.
+        """
+        paper     = QuestionPaper.coerce(question_paper)
+        budget, _ = request_budget(self.model)
+        prompt, max_tokens, total = self._request(paper, answer_sheet, _tokens(answer_sheet))
+        if total <= budget or len(paper.questions) < 2:
+            return [(paper, answer_sheet, prompt, max_tokens)]
+
+        answers = segment_answers(answer_sheet, paper)
+        if not answers:
+            # Unnumbered: every chunk would need the whole sheet, multiplying an already oversized request
+            telemetry.count("evaluate.over_budget", model=self.model)
+            return [(paper, answer_sheet, prompt, max_tokens)]
+
+        def request(questions):
+            sub   = dataclasses.replace(paper, questions=tuple(questions))
+            sheet = self._sheet_for(questions, answers)
+            return (sub, sheet) + self._request(sub, sheet, _tokens(sheet))
+
+        chunks, current = [], []
+        for q in paper.questions:
+            if current and request(current + [q])[-1] > budget:
+                chunks.append(request(current)[:-1])
+                current = []
+            current.append(q)
+        chunks.append(request(current)[:-1])
+        return chunks
+
+    def _build_prompt(self, paper, answer_sheet):
+        if not paper.questions:
+            return self._build_freeform_prompt(paper.text, answer_sheet)
+
+        return f"""You are an expert examiner evaluating student answers.
 
 STRICTNESS MODE: {self.strictness}
 {self.STRICTNESS_RULES[self.strictness]}
 
-PARTIAL CREDIT: {partial_note}
+QUESTIONS (number, max marks, text):
+{paper.to_prompt()}
+
+STUDENT ANSWER SHEET:
+{answer_sheet}
+
+INSTRUCTIONS:
+1. Match each numbered question above to the student's answer ("" if unanswered);
+   grade only those questions, even if the sheet also answers others
+2. Assign similarity_score (0-100) following the {self.strictness} rules above
+
+Respond ONLY with valid JSON — no markdown, no extra text:
+
+{{
+  "overall_feedback": "<2-3 sentence summary>",
+  "questions": [{{
+    "question_number": <number from the list above>,
+    "student_answer": "<text>",
+    "similarity_score": <0-100 following {self.strictness} rules>,
+    "feedback": "<one line>",
+    "key_points_covered": ["<pt>"],
+    "missing_points": ["<pt>"]
+  }}]
+}}"""
+
+    def _build_freeform_prompt(self, question_paper, answer_sheet):
+        """Fallback when no numbered questions could be found locally — the LLM parses the paper."""
+        return f"""You are an expert examiner evaluating student answers.
+
+STRICTNESS MODE: {self.strictness}
+{self.STRICTNESS_RULES[self.strictness]}
 
 QUESTION PAPER:
 {question_paper}
@@ -70,31 +480,434 @@ Respond ONLY with valid JSON — no markdown, no extra text:
     "missing_points": ["<pt>"]
   }}]
 }}"""
+
+    @staticmethod
+    def _parse_json(raw):
+        with telemetry.span("llm.parse_json"):
+            cleaned = re.sub(r"```(?:json)?", "", raw).strip().strip("`")
+            if cleaned != raw.strip():
+                telemetry.count("llm.json_repairs")
+            data = json.loads(cleaned)
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a JSON object in the response, got {type(data).__name__}")
+            return data
+
+    @staticmethod
+    def _align(graded, paper):
+        """
+        Lay the LLM's per-question grades over the locally parsed paper: question
+        text and max marks always come from `paper`.  A question the model
+        skipped is recorded as unanswered — unless the reply also holds entries
+        that match no question on the paper, in which case the unmatched
+        questions may have been graded under a label we could not read, so they
+        are returned as failed instead.  Returns (entries, failed numbers).
+        """
+        by_number, unmatched = {}, 0
+        for q in graded:
+            number = _question_number(q.get("question_number")) if isinstance(q, dict) else None
+            if number is None or paper.get(number) is None:
+                unmatched += 1
+                continue
+            by_number.setdefault(number, q)
+
+        failed = [pq.number for pq in paper.questions if pq.number not in by_number] if unmatched else []
+        lost   = {"feedback": "Grading failed: the reply did not name this question"}
+        return [AnswerEvaluator._aligned_entry(pq, by_number.get(pq.number, lost if pq.number in failed else {}))
+                for pq in paper.questions], failed
+
+    @staticmethod
+    def _aligned_entry(pq, q):
+        return {
+            "question_number":    pq.number,
+            "question":           pq.text,
+            "max_marks":          pq.max_marks,
+            "student_answer":     q.get("student_answer", ""),
+            "similarity_score":   q.get("similarity_score", 0),
+            "feedback":           q.get("feedback", NO_ANSWER_FEEDBACK),
+            "key_points_covered": q.get("key_points_covered", []),
+            "missing_points":     q.get("missing_points", []),
+        }
+
+    def _mark(self, q):
+        """Set q["earned"] from its similarity score and max marks."""
+        q["earned"] = marks_for(q.get("similarity_score", 0), q.get("max_marks", 5), self.partial_credit)
+        return q
+
+    def _score_one(self, q, paper):
+        """Align and mark a single streamed question.  Returns None if it is not on the paper."""
+        if paper.questions:
+            number = _question_number(q.get("question_number"))
+            pq     = paper.get(number) if number is not None else None
+            if pq is None:
+                return None
+            q = self._aligned_entry(pq, q)
+        return self._mark(q)
+
+    def _score(self, data, paper):
+        """Recalculate marks locally to ensure consistency."""
+        qs = data.get("questions", [])
+        if not isinstance(qs, list):
+            raise ValueError(f'"questions" should be a list, got {type(qs).__name__}')
+        if paper.questions:
+            qs, failed = self._align(qs, paper)
+            data["questions"] = qs
+            if failed:
+                data["failed_questions"] = sorted(set(data.get("failed_questions", [])) | set(failed))
+
+        total_earned = 0
+        for q in qs:
+            total_earned += self._mark(q)["earned"]
+
+        data["total_max"]    = sum(q.get("max_marks", 5) for q in qs)
+        data["total_earned"] = round(total_earned, 1)
+        return data
+
+    def _evaluate(self, paper, answer_sheet, meter=None):
+        chunks = self.plan(paper, answer_sheet)
+        if len(chunks) > 1:
+            return self._evaluate_chunked(paper, chunks, meter)
+        _, _, prompt, max_tokens = chunks[0]
         try:
-            raw  = self.client.chat.completions.create(
-                model=self.model, 
+            raw  = chat_completion(
+                self.client,
+                model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.1,
-                max_tokens=4096
+                max_tokens=max_tokens,
+                meter=meter
             ).choices[0].message.content
-            raw  = re.sub(r"```(?:json)?", "", raw).strip().strip("`")
-            data = json.loads(raw)
-            qs   = data.get("questions", [])
-            
-            # Recalculate to ensure consistency
-            total_earned = 0
-            for q in qs:
-                sim   = q.get("similarity_score", 0)
-                max_m = q.get("max_marks", 5)
-                if self.partial_credit:
-                    earned = round((sim / 100) * max_m, 1)
-                else:
-                    earned = max_m if sim >= 70 else 0
-                q["earned"] = earned
-                total_earned += earned
-            
-            data["total_max"]    = sum(q.get("max_marks", 5) for q in qs)
-            data["total_earned"] = round(total_earned, 1)
-            return data
+            return self._score(self._parse_json(raw), paper)
         except Exception as e:
-            return {"error": str(e)}
\ No newline at end of file
+            telemetry.count("evaluate.errors", error=type(e).__name__)
+            return {"error": str(e)}
+
+    def _grade_chunk(self, prompt, max_tokens, meter=None):
+        """Graded question dicts for one planned chunk.  Raises on API or JSON errors so the caller can retry."""
+        raw = chat_completion(
+            self.client,
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=max_tokens,
+            meter=meter
+        ).choices[0].message.content
+        return self._parse_json(raw).get("questions", [])
+
+    def _evaluate_chunked(self, paper, chunks, meter=None):
+        """
+        Grade an oversized sheet as several whole-sheet requests (see plan), up
+        to `question_workers` at a time, retrying failed chunks.  Questions from
+        chunks that still fail are scored 0 and listed under "failed_questions".
+        """
+        graded, errors, todo = [], {}, list(chunks)
+        with ThreadPoolExecutor(max_workers=max(1, self.q_workers)) as pool:
+            for _ in range(self.retries + 1):
+                if not todo:
+                    break
+                futures = {pool.submit(self._grade_chunk, prompt, max_tokens, meter): (sub, sheet, prompt, max_tokens)
+                           for sub, sheet, prompt, max_tokens in todo}
+                todo = []
+                for fut in as_completed(futures):
+                    chunk = futures[fut]
+                    try:
+                        graded.extend(fut.result())
+                    except Exception as e:
+                        telemetry.count("evaluate.retries", unit="chunk", error=type(e).__name__)
+                        errors.update((q.number, str(e)) for q in chunk[0].questions)
+                        todo.append(chunk)
+                        continue
+                    for q in chunk[0].questions:
+                        errors.pop(q.number, None)
+
+        if len(errors) == len(paper.questions):
+            return {"error": f"Grading failed for every chunk: {next(iter(errors.values()))}"}
+        for number, err in errors.items():
+            graded.append({"question_number": number, "similarity_score": 0, "feedback": f"Grading failed: {err}"})
+
+        data = self._score({"questions": graded}, paper)
+        data["overall_feedback"] = self._summary_feedback(data["questions"], data["total_earned"], data["total_max"])
+        data["chunks"] = len(chunks)
+        if errors:
+            data["failed_questions"] = sorted(set(errors) | set(data.get("failed_questions", [])))
+        return data
+
+    # ── Streaming ─────────────────────────────────────────────────────────────
+
+    def evaluate_stream(self, question_paper, answer_sheet):
+        """
+        Generator version of evaluate().  Yields ("question", q) for each graded
+        question as soon as it is complete, then ("result", result) with the same
+        dict evaluate() returns (possibly {"error": ...}).
+        """
+        paper = QuestionPaper.coerce(question_paper)
+        key   = self.cache_key(paper, answer_sheet) if self.use_cache else None
+        hit   = self.cache.get(key) if key else None
+        if hit is not None:
+            telemetry.count("evaluate.cache_hits")
+            result = dict(rescore(hit, self.partial_credit), cached=True, usage=empty_usage())
+            for q in result.get("questions", []):
+                yield "question", q
+            yield "result", result
+            return
+
+        meter = UsageMeter()
+        start = time.perf_counter()     # not a span: the consumer runs between yields
+        local, rest, sheet = self._prescore(paper, answer_sheet)
+        for q in local:
+            yield "question", q
+        if rest is None:
+            events = iter([("result", {"questions": []})])
+        elif self.segmented and rest.questions:
+            events = self._iter_segmented(rest, sheet, meter)
+        else:
+            events = self._iter_streamed(rest, sheet, meter)
+        if self.cascade_model and rest is not None:
+            events = self._iter_cascaded(events, rest, sheet, meter)
+        for kind, payload in events:
+            if kind == "result":
+                if local:
+                    payload = self._merge_prescored(local, payload, paper)
+                payload["usage"] = meter.summary()
+                telemetry.observe("evaluate", time.perf_counter() - start, "error" if "error" in payload else None,
+                                  mode=self._mode + "+stream")
+                if key and "error" not in payload and not payload.get("failed_questions"):
+                    self.cache.set(key, copy.deepcopy(payload))
+            yield kind, payload
+
+    def _iter_streamed(self, paper, answer_sheet, meter=None):
+        plan = self.plan(paper, answer_sheet)
+        if len(plan) > 1:
+            # Too big for one request: grade the chunks in parallel, then emit everything at once
+            result = self._evaluate_chunked(paper, plan, meter)
+            for q in result.get("questions", []):
+                yield "question", q
+            yield "result", result
+            return
+
+        _, _, prompt, max_tokens = plan[0]
+        chunks, scanner, seen = [], _QuestionStream(), []
+        try:
+            stream = chat_completion(
+                self.client,
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.1,
+                max_tokens=max_tokens,
+                stream=True,
+                meter=meter
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                chunks.append(delta)
+                for q in scanner.feed(delta):
+                    q = self._score_one(q, paper)
+                    if q is not None and not (paper.questions and q["question_number"] in seen):
+                        seen.append(q.get("question_number"))
+                        yield "question", q
+        except Exception as e:
+            telemetry.count("evaluate.errors", error=type(e).__name__)
+            yield "result", {"error": str(e)}
+            return
+
+        try:
+            data = self._parse_json("".join(chunks))
+        except Exception as e:
+            telemetry.count("evaluate.errors", error=type(e).__name__)
+            if not seen:
+                yield "result", {"error": str(e)}
+                return
+            if not paper.questions:
+                yield "result", {"error": f"Response was cut off after {len(seen)} question(s): {e}"}
+                return
+            # Truncated response: keep every question that did arrive intact, fail the rest
+            data = {"questions": _QuestionStream().feed("".join(chunks)), "truncated": True}
+
+        try:
+            data = self._score(data, paper)
+        except Exception as e:
+            telemetry.count("evaluate.errors", error=type(e).__name__)
+            yield "result", {"error": f"Unusable response: {e}"}
+            return
+        if data.pop("truncated", False):
+            lost = [q for q in data["questions"] if q["question_number"] not in seen]
+            for q in lost:
+                q["feedback"] = "Grading failed: the response was cut off before this question"
+            data["failed_questions"] = sorted(set(data.get("failed_questions", [])) | {q["question_number"] for q in lost})
+        if not data.get("overall_feedback"):
+            data["overall_feedback"] = self._summary_feedback(data["questions"], data["total_earned"], data["total_max"])
+        if paper.questions:
+            unsent = [q for q in data["questions"] if q["question_number"] not in seen]
+        else:
+            unsent = data["questions"][len(seen):]
+        for q in unsent:
+            yield "question", q
+        yield "result", data
+
+    def _iter_cascaded(self, events, paper, answer_sheet, meter=None):
+        """
+        Wrap a first-pass event stream: uncertain questions are held back until
+        _escalate has re-graded them, so each question is still yielded once.
+        """
+        sent = set()
+        for kind, payload in events:
+            if kind == "question":
+                if paper.questions and self._uncertain(payload):
+                    continue
+                sent.add(payload.get("question_number"))
+                yield kind, payload
+                continue
+            payload = self._escalate(payload, paper, answer_sheet, meter)
+            regraded = set(payload.get("escalated_questions", []))
+            for q in payload.get("questions", []):
+                number = q.get("question_number")
+                if number in regraded or number not in sent:
+                    yield "question", q
+            yield "result", payload
+
+    # ── Per-question fan-out ──────────────────────────────────────────────────
+
+    def _build_question_prompt(self, question, answer):
+        return f"""You are an expert examiner grading ONE student answer.
+
+STRICTNESS MODE: {self.strictness}
+{self.STRICTNESS_RULES[self.strictness]}
+
+QUESTION ({question.max_marks} marks):
+{question.text}
+
+STUDENT ANSWER:
+{answer}
+
+Assign similarity_score (0-100) following the {self.strictness} rules above.
+
+Respond ONLY with valid JSON — no markdown, no extra text:
+
+{{
+  "similarity_score": <0-100>,
+  "feedback": "<one line>",
+  "key_points_covered": ["<pt>"],
+  "missing_points": ["<pt>"]
+}}"""
+
+    def _grade_question(self, question, answer, meter=None):
+        """Grade a single question.  Raises on API or JSON errors so the caller can retry."""
+        raw = chat_completion(
+            self.client,
+            model=self.model,
+            messages=[{"role": "user", "content": self._build_question_prompt(question, answer)}],
+            temperature=0.1,
+            max_tokens=512,
+            meter=meter
+        ).choices[0].message.content
+        graded = self._parse_json(raw)
+        if "similarity_score" not in graded:
+            raise ValueError(f"Q{question.number}: response has no similarity_score")
+        return dict(graded, question_number=question.number, student_answer=answer)
+
+    @staticmethod
+    def _summary_feedback(qs, total_earned, total_max):
+        answered = [q for q in qs if q.get("student_answer", "").strip()]
+        if not answered:
+            return f"No answers were found on this sheet ({total_earned} / {total_max})."
+        best  = max(answered, key=lambda q: q.get("similarity_score", 0))
+        worst = min(qs, key=lambda q: q.get("similarity_score", 0))
+        return (f"Scored {total_earned} / {total_max}, answering {len(answered)} of {len(qs)} questions. "
+                f"Strongest answer: Q{best['question_number']} ({best.get('similarity_score', 0)}%). "
+                f"Needs most work: Q{worst['question_number']} ({worst.get('similarity_score', 0)}%).")
+
+    def _evaluate_segmented(self, paper, answer_sheet, meter=None):
+        result = None
+        for kind, payload in self._iter_segmented(paper, answer_sheet, meter):
+            if kind == "result":
+                result = payload
+        return result
+
+    def _iter_segmented(self, paper, answer_sheet, meter=None):
+        """
+        Split the sheet into per-question answers, grade them concurrently as small
+        requests, retry only the failures, and merge into the usual result schema.
+        Yields ("question", q) as each question is graded, then ("result", result).
+        Questions that still fail are scored 0 and listed under "failed_questions".
+        """
+        answers = segment_answers(answer_sheet, paper)
+        graded, errors = {}, {}
+        todo = []
+        for q in paper.questions:
+            if answers:
+                answer = answers.get(q.number, "")
+            else:
+                answer = answer_sheet         # no numbering on the sheet — let the model find the answer
+            if answer.strip():
+                todo.append((q, answer))
+            else:
+                graded[q.number] = self._score_one({"question_number": q.number, "student_answer": "",
+                                                    "similarity_score": 0,
+                                                    "feedback": NO_ANSWER_FEEDBACK}, paper)
+                yield "question", graded[q.number]
+
+        with ThreadPoolExecutor(max_workers=max(1, self.q_workers)) as pool:
+            for _ in range(self.retries + 1):
+                if not todo:
+                    break
+                futures = {pool.submit(self._grade_question, q, answer, meter): (q, answer) for q, answer in todo}
+                todo = []
+                for fut in as_completed(futures):
+                    q, answer = futures[fut]
+                    try:
+                        graded[q.number] = self._score_one(fut.result(), paper)
+                    except Exception as e:
+                        telemetry.count("evaluate.retries", unit="question", error=type(e).__name__)
+                        errors[q.number] = str(e)
+                        todo.append((q, answer))
+                        continue
+                    errors.pop(q.number, None)
+                    yield "question", graded[q.number]
+
+        if errors and len(errors) == len(paper.questions):
+            yield "result", {"error": f"Grading failed for every question: {next(iter(errors.values()))}"}
+            return
+
+        for number, err in sorted(errors.items()):
+            graded[number] = self._score_one({"question_number": number, "student_answer": answers.get(number, ""),
+                                              "similarity_score": 0, "feedback": f"Grading failed: {err}"}, paper)
+            yield "question", graded[number]
+
+        data = self._score({"questions": list(graded.values())}, paper)
+        data["overall_feedback"] = self._summary_feedback(data["questions"], data["total_earned"], data["total_max"])
+        if errors:
+            data["failed_questions"] = sorted(set(errors) | set(data.get("failed_questions", [])))
+        yield "result", data
+
+    def evaluate_batch(self, question_paper, answer_sheets, max_workers=4, on_result=None):
+        """
+        Grade many answer sheets against one question paper concurrently.
+        At most `max_workers` sheets are graded at once; segmented, chunked and
+        cascade grading fan each sheet out to up to `question_workers` requests,
+        so up to `max_workers × question_workers` Groq calls can be in flight
+        (the per-key rate limiter still paces them).  Results come back in the
+        same order as `answer_sheets`, each with an "elapsed" (seconds) key.
+        `on_result(index, result)`, if given, is called as each sheet finishes.
+        """
+        sheets = list(answer_sheets)
+        if not sheets:
+            return []
+        paper = QuestionPaper.coerce(question_paper)     # parse once for the whole class
+
+        def timed(sheet):
+            start  = time.perf_counter()
+            result = self.evaluate(paper, sheet)
+            result["elapsed"] = round(time.perf_counter() - start, 2)
+            return result
+
+        workers = max(1, min(int(max_workers), len(sheets)))
+        results = [None] * len(sheets)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(timed, sheet): i for i, sheet in enumerate(sheets)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                results[i] = fut.result()
+                if on_result:
+                    on_result(i, results[i])
+        return results
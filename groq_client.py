@@ -0,0 +1,407 @@
+import os, random, threading, time
+
+import telemetry
+
+
+# ── Per-model rate limits ─────────────────────────────────────────────────────
+
+# (requests / minute, tokens / minute) — Groq free-tier defaults.  Override them for a paid key with
+# $SMARTGRADE_RATE_LIMITS, cli.py --rate-limit, the app sidebar or set_rate_limit()
+DEFAULT_LIMITS = {
+    "llama-3.3-70b-versatile":                   (30, 12000),
+    "llama-3.1-8b-instant":                      (30, 6000),
+    "mixtral-8x7b-32768":                        (30, 5000),
+    "gemma2-9b-it":                              (30, 15000),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (30, 30000),
+}
+FALLBACK_LIMIT  = (30, 6000)
+IMAGE_TOKENS    = 1000          # rough prompt cost of one image part
+RETRY_STATUSES  = {408, 409, 429, 500, 502, 503, 504}
+
+# (context window, max completion tokens) per model
+CONTEXT_LIMITS = {
+    "llama-3.3-70b-versatile":                   (131072, 32768),
+    "llama-3.1-8b-instant":                      (131072, 8192),
+    "mixtral-8x7b-32768":                        (32768, 32768),
+    "gemma2-9b-it":                              (8192, 8192),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (131072, 8192),
+}
+FALLBACK_CONTEXT = (8192, 4096)
+
+# USD per million (prompt, completion) tokens — Groq on-demand list prices, for cost estimates only
+PRICES_PER_M = {
+    "llama-3.3-70b-versatile":                   (0.59, 0.79),
+    "llama-3.1-8b-instant":                      (0.05, 0.08),
+    "mixtral-8x7b-32768":                        (0.24, 0.24),
+    "gemma2-9b-it":                              (0.20, 0.20),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (0.11, 0.34),
+}
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate     = per_minute / 60.0
+        self.level    = self.capacity
+        self.stamp    = time.monotonic()
+
+    def _refill(self):
+        now         = time.monotonic()
+        self.level  = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp  = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (requests larger than the bucket wait for a full one)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min buckets for one (API key, model) pair.  acquire()
+    blocks until a request of the estimated size fits under both limits; settle()
+    hands back any tokens reserved beyond what the response actually used (all
+    of them when the request failed).
+    """
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens   = TokenBucket(tpm) if tpm else None
+        self._lock    = threading.Lock()
+
+    def acquire(self, tokens):
+        waited = 0.0
+        while True:
+            with self._lock:
+                wait = max(self.requests.wait_time(1) if self.requests else 0.0,
+                           self.tokens.wait_time(tokens) if self.tokens else 0.0)
+                if wait <= 0:
+                    if self.requests: self.requests.take(1)
+                    if self.tokens:   self.tokens.take(tokens)
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def settle(self, reserved, used):
+        if self.tokens and used is not None and used < reserved:
+            with self._lock:
+                self.tokens.give(reserved - used)
+
+
+# Groq quotas are per API key, so each (api_key, model) pair gets its own limiter
+_limiters      = {}
+_overrides     = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limit(model):
+    """(requests / minute, tokens / minute) applied to `model`; None means unbounded."""
+    return _overrides.get(model) or _overrides.get("*") or DEFAULT_LIMITS.get(model, FALLBACK_LIMIT)
+
+
+
+def set_rate_limit(model, rpm, tpm):
+    """
+    Override the limits for `model` ("*": every model without its own override)
+    under every API key; pass None for either to leave it unbounded.
+    """
+    with _limiters_lock:
+        if _overrides.get(model) == (rpm, tpm):
+            return
+        _overrides[model] = (rpm, tpm)
+        for key in [k for k in _limiters if model == "*" or k[1] == model]:
+            del _limiters[key]
+
+
+def parse_rate_limits(spec):
+    """
+    {model: (rpm, tpm)} from "RPM/TPM" (every model) or a comma-separated list
+    of "model=RPM/TPM"; "*" as the model means every model, and "-" or 0 leaves
+    that limit unbounded.  Raises ValueError on anything else.
+    """
+    def number(text):
+        text = text.strip()
+        if text in ("-", "", "0"):
+            return None
+        value = int(text)
+        if value < 0:
+            raise ValueError(f"negative rate limit {text!r}")
+        return value
+
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, pair = item.rpartition("=")
+        rpm, sep, tpm  = pair.partition("/")
+        if not sep:
+            raise ValueError(f"expected [model=]RPM/TPM, got {item!r}")
+        limits[model.strip() or "*"] = (number(rpm), number(tpm))
+    return limits
+
+
+def _limits_from_env():
+    spec = os.environ.get("SMARTGRADE_RATE_LIMITS")
+    if not spec:
+        return
+    try:
+        for model, (rpm, tpm) in parse_rate_limits(spec).items():
+            set_rate_limit(model, rpm, tpm)
+    except ValueError as e:
+        print(f"[Rate limit warning]: ignoring $SMARTGRADE_RATE_LIMITS: {e}")
+
+
+_limits_from_env()
+
+
+def get_limiter(model, api_key=None):
+    with _limiters_lock:
+        key = (api_key, model)
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(*rate_limit(model))
+        return _limiters[key]
+
+
+def request_budget(model):
+    """
+    Largest (prompt + max_tokens) one request to `model` should use: its context
+    window, capped by the tokens-per-minute limit (Groq rejects any single
+    request bigger than that).  Returns (total_tokens, max_completion_tokens).
+    """
+    context, max_output = CONTEXT_LIMITS.get(model, FALLBACK_CONTEXT)
+    _, tpm = rate_limit(model)
+    if tpm:
+        context = min(context, int(tpm))
+    return context, min(max_output, context)
+
+
+# ── Shared clients ────────────────────────────────────────────────────────────
+
+_clients      = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key):
+    """
+    One Groq client per API key, shared by every thread, over a pooled
+    keep-alive HTTP connection.  SDK retries are off — chat_completion() retries.
+    """
+    with _clients_lock:
+        if api_key not in _clients:
+            import httpx
+            from groq import Groq
+            http = httpx.Client(limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+                                timeout=httpx.Timeout(120.0, connect=10.0))
+            _clients[api_key] = Groq(api_key=api_key, max_retries=0, http_client=http)
+        return _clients[api_key]
+
+
+# ── Counters ──────────────────────────────────────────────────────────────────
+
+_stats      = {"calls": 0, "retries": 0, "rate_limited": 0, "throttle_wait_s": 0.0,
+               "prompt_tokens": 0, "completion_tokens": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def stats():
+    """Snapshot of call / retry / 429 / token counters and total time spent waiting on the local limiter."""
+    with _stats_lock:
+        return dict(_stats, throttle_wait_s=round(_stats["throttle_wait_s"], 2))
+
+
+# ── Usage metering ────────────────────────────────────────────────────────────
+
+def _cost(model, prompt_tokens, completion_tokens):
+    price_in, price_out = PRICES_PER_M.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1e6
+
+
+def empty_usage():
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+            "estimated_prompt_tokens": 0, "latency_s": 0.0, "cost_usd": 0.0, "by_model": {}}
+
+
+def merge_usage(summaries):
+    """Add up UsageMeter.summary() dicts (e.g. one per sheet) into one, keeping the per-model split."""
+    total = empty_usage()
+    for summary in summaries:
+        if not summary:
+            continue
+        for model, part in summary.get("by_model", {}).items():
+            into = total["by_model"].setdefault(model, {k: v for k, v in empty_usage().items() if k != "by_model"})
+            for k in into:
+                into[k] += part.get(k, 0)
+        for k in total:
+            if k != "by_model":
+                total[k] += summary.get(k, 0)
+    total["latency_s"] = round(total["latency_s"], 3)
+    total["cost_usd"]  = round(total["cost_usd"], 6)
+    for part in total["by_model"].values():
+        part["latency_s"] = round(part["latency_s"], 3)
+        part["cost_usd"]  = round(part["cost_usd"], 6)
+    return total
+
+
+class UsageMeter:
+    """
+    Per-call token usage and wall time, filled in by chat_completion(meter=...).
+    Thread-safe, so one meter can span a sheet's concurrent requests.  Calls whose
+    response carried no usage are counted from the local estimate instead.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add(self, model, prompt_tokens, completion_tokens, latency_s, estimated_prompt_tokens):
+        with self._lock:
+            self.calls.append({"model": model, "prompt_tokens": prompt_tokens,
+                               "completion_tokens": completion_tokens, "latency_s": latency_s,
+                               "estimated_prompt_tokens": estimated_prompt_tokens})
+
+    def summary(self):
+        """Totals plus a by_model split: calls, tokens, summed latency and estimated cost."""
+        with self._lock:
+            calls = list(self.calls)
+        parts = []
+        for c in calls:
+            part = {"calls": 1, "prompt_tokens": c["prompt_tokens"], "completion_tokens": c["completion_tokens"],
+                    "total_tokens": c["prompt_tokens"] + c["completion_tokens"],
+                    "estimated_prompt_tokens": c["estimated_prompt_tokens"], "latency_s": c["latency_s"],
+                    "cost_usd": _cost(c["model"], c["prompt_tokens"], c["completion_tokens"])}
+            parts.append(dict(part, by_model={c["model"]: part}))
+        return merge_usage(parts)
+
+
+# ── Completions ───────────────────────────────────────────────────────────────
+
+def estimate_tokens(messages, max_tokens=0):
+    """Cheap upper-bound guess at a request's token cost (≈4 characters per token)."""
+    total = 0
+    for m in messages:
+        content = m.get("content", "")
+        if isinstance(content, str):
+            total += len(content) // 4 + 4
+            continue
+        for part in content:
+            total += IMAGE_TOKENS if part.get("type") == "image_url" else len(part.get("text", "")) // 4
+    return total + (max_tokens or 0)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUSES
+    # No HTTP status: connection reset, timeout, DNS hiccup
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout")
+
+
+def _usage_of(obj):
+    """(prompt_tokens, completion_tokens) from a response or final stream chunk, or None."""
+    usage = getattr(obj, "usage", None)
+    if usage is None:
+        x_groq = getattr(obj, "x_groq", None)
+        usage  = x_groq.get("usage") if isinstance(x_groq, dict) else getattr(x_groq, "usage", None)
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else lambda k: getattr(usage, k, None)
+    if get("prompt_tokens") is None:
+        return None
+    return int(get("prompt_tokens")), int(get("completion_tokens") or 0)
+
+
+def _record(model, limiter, reserved, estimate, usage, text_len, started, meter, error=None):
+    """Settle the limiter and count / meter / trace one finished call."""
+    elapsed = time.perf_counter() - started
+    telemetry.observe("llm.call", elapsed, error, model=model)
+    if usage is None:
+        usage = (estimate, text_len // 4)
+    else:
+        limiter.settle(reserved, sum(usage))
+    _count("prompt_tokens", usage[0])
+    _count("completion_tokens", usage[1])
+    telemetry.count("llm.prompt_tokens", usage[0], model=model)
+    telemetry.count("llm.completion_tokens", usage[1], model=model)
+    if meter is not None:
+        meter.add(model, usage[0], usage[1], round(elapsed, 3), estimate)
+
+
+def _metered(stream, model, limiter, reserved, estimate, started, meter):
+    """Pass stream chunks through, recording usage once the stream is exhausted."""
+    usage, text_len, error = None, 0, None
+    try:
+        for chunk in stream:
+            usage = _usage_of(chunk) or usage
+            if getattr(chunk, "choices", None):
+                text_len += len(chunk.choices[0].delta.content or "")
+            yield chunk
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _record(model, limiter, reserved, estimate, usage, text_len, started, meter, error)
+
+
+def chat_completion(client, *, model, messages, max_tokens, temperature=0.1, stream=False,
+                    max_retries=5, base_delay=1.0, max_delay=30.0, meter=None, **kwargs):
+    """
+    chat.completions.create() behind the (API key, model) rate limiter, with jittered
+    exponential backoff on 429 / 5xx / connection errors (honouring Retry-After).
+    Non-retryable errors, or the last retryable one, are raised to the caller.
+    Token usage and wall time of the successful attempt go to `meter` (a UsageMeter).
+    """
+    limiter  = get_limiter(model, getattr(client, "api_key", None))
+    estimate = estimate_tokens(messages)
+    reserved = estimate + (max_tokens or 0)
+
+    for attempt in range(max_retries + 1):
+        waited = limiter.acquire(reserved)
+        _count("throttle_wait_s", waited)
+        _count("calls")
+        if waited:
+            telemetry.count("llm.throttle_wait_seconds", waited, model=model)
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens,
+                                                      temperature=temperature, stream=stream, **kwargs)
+        except Exception as e:
+            limiter.settle(reserved, 0)     # nothing was served: hand the reservation back
+            status = getattr(e, "status_code", None)
+            telemetry.observe("llm.call", time.perf_counter() - started, type(e).__name__, model=model)
+            telemetry.count("llm.errors", model=model, status=status or type(e).__name__)
+            if status == 429:
+                _count("rate_limited")
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            _count("retries")
+            telemetry.count("llm.retries", model=model)
+            delay = _retry_after(e) or random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            time.sleep(delay)
+            continue
+
+        if stream:
+            return _metered(response, model, limiter, reserved, estimate, started, meter)
+        choices = getattr(response, "choices", None) or []
+        text    = (choices[0].message.content or "") if choices else ""
+        _record(model, limiter, reserved, estimate, _usage_of(response), len(text), started, meter)
+        return response
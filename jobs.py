@@ -0,0 +1,324 @@
+import json, os, socket, sqlite3, threading, time, uuid
+
+import telemetry
+from cache import default_cache_path
+
+ACTIVE   = ("queued", "running")
+FINISHED = ("done", "failed", "cancelled")
+
+# kind → fn(payload, data, secrets, report) -> JSON-serialisable result
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register the function that runs jobs of `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+class Transient:
+    """
+    Wrapper for a handler result that is stored as usual but never reused by
+    submit(key=...) — e.g. text extracted while an OCR engine was failing.
+    """
+
+    def __init__(self, result):
+        self.result = result
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _alive(owner):
+    """False only when `owner` is a process on this host that no longer exists."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class JobQueue:
+    """
+    Local job queue: a SQLite job table worked by a pool of daemon threads.
+
+    submit() returns a job id straight away; the work runs in the background and
+    get(job_id) reports status, progress and the result, so a caller (a Streamlit
+    script, typically) can be interrupted, rerun or refreshed without losing it.
+    Handlers can publish partial progress while they run.
+
+    Secrets passed to submit() (API keys) are held in memory only and never
+    written to the table.  Jobs left queued or running by a process that has
+    since died are marked failed when the next queue opens the same database.
+    """
+
+    def __init__(self, path=None, workers=4, keep_s=24 * 3600, poll_s=1.0):
+        path = path or default_cache_path("jobs")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path     = path
+        self.poll_s   = poll_s
+        self.owner    = _owner()
+        self._lock    = threading.Lock()
+        self._wake    = threading.Condition()
+        self._secrets = {}
+        self._closed  = False
+        self._conn    = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id       TEXT PRIMARY KEY,
+            kind     TEXT NOT NULL,
+            dedupe   TEXT,
+            status   TEXT NOT NULL,
+            owner    TEXT,
+            payload  TEXT NOT NULL,
+            data     BLOB,
+            progress TEXT,
+            result   TEXT,
+            error    TEXT,
+            created  REAL NOT NULL,
+            started  REAL,
+            finished REAL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs(dedupe)")
+        self._recover(keep_s)
+
+        self._threads = [threading.Thread(target=self._work, name=f"smartgrade-job-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+
+    def _recover(self, keep_s):
+        with self._lock:
+            for job_id, owner in self._conn.execute("SELECT id, owner FROM jobs WHERE status IN ('queued', 'running')"
+                                                    ).fetchall():
+                if not _alive(owner):
+                    self._conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished = ?, data = NULL "
+                                       "WHERE id = ?", ("Interrupted — the server restarted", time.time(), job_id))
+            self._conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished < ?",
+                               (time.time() - keep_s,))
+
+    # ── Client side ───────────────────────────────────────────────────────────
+
+    def submit(self, kind, payload, data=None, secrets=None, key=None):
+        """
+        Queue a `kind` job and return its id.  With `key`, an existing queued,
+        running or finished-successfully job with the same key is reused instead.
+        `data` is an optional bytes blob (e.g. an uploaded file) kept out of the JSON.
+        Results a handler returned as Transient are never reused.
+        """
+        if kind not in HANDLERS:
+            raise ValueError(f"unknown job kind {kind!r}")
+        with self._lock:
+            if key:
+                row = self._conn.execute("SELECT id FROM jobs WHERE dedupe = ? AND status IN ('queued', 'running', "
+                                         "'done') ORDER BY created DESC LIMIT 1", (key,)).fetchone()
+                if row:
+                    return row[0]
+            job_id = uuid.uuid4().hex
+            if secrets:
+                self._secrets[job_id] = secrets
+            self._conn.execute("INSERT INTO jobs (id, kind, dedupe, status, owner, payload, data, created) "
+                               "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                               (job_id, kind, key, self.owner, json.dumps(payload), data, time.time()))
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def get(self, job_id, with_payload=False):
+        """{id, kind, status, progress, result, error, created, started, finished[, payload]} or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT id, kind, status, progress, result, error, created, started, finished, "
+                                     "payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "kind", "status", "progress", "result", "error", "created", "started", "finished"), row))
+        for field in ("progress", "result"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        if with_payload:
+            job["payload"] = json.loads(row[9])
+        return job
+
+    def wait(self, job_id, timeout=None, interval=0.2):
+        """Block until the job finishes (or `timeout` seconds pass) and return get(job_id)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(interval)
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started yet.  Returns True if it was cancelled."""
+        with self._lock:
+            cur = self._conn.execute("UPDATE jobs SET status = 'cancelled', finished = ?, data = NULL "
+                                     "WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+            self._secrets.pop(job_id, None)
+            return cur.rowcount > 0
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in ACTIVE + FINISHED}
+
+    def close(self):
+        self._closed = True
+        with self._wake:
+            self._wake.notify_all()
+
+    # ── Worker side ───────────────────────────────────────────────────────────
+
+    def _claim(self):
+        """
+        Atomically move this process's oldest queued job to running (its secrets
+        live here).  Returns (id, kind, payload, data) or None.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT id, kind, payload, data FROM jobs WHERE status = 'queued' "
+                                         "AND owner = ? ORDER BY created LIMIT 1", (self.owner,)).fetchone()
+                if row:
+                    self._conn.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?",
+                                       (time.time(), row[0]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _update(self, job_id, **fields):
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def _work(self):
+        while not self._closed:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"[Job queue warning]: {e}")
+                job = None
+            if job is None:
+                with self._wake:
+                    self._wake.wait(self.poll_s)
+                continue
+            self._run(*job)
+
+    def _run(self, job_id, kind, payload, data):
+        with self._lock:
+            secrets = self._secrets.pop(job_id, {})
+
+        def report(progress):
+            self._update(job_id, progress=json.dumps(progress))
+
+        try:
+            with telemetry.span("job", kind=kind):
+                result = HANDLERS[kind](json.loads(payload), data, secrets, report)
+            extra = {}
+            if isinstance(result, Transient):
+                result, extra = result.result, {"dedupe": None}
+            self._update(job_id, status="done", result=json.dumps(result), finished=time.time(), data=None, **extra)
+        except Exception as e:
+            telemetry.count("jobs.failed", kind=kind, error=type(e).__name__)
+            self._update(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished=time.time(), data=None)
+
+
+_queue      = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide JobQueue with $SMARTGRADE_JOB_WORKERS (default 4) worker threads."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(workers=int(os.environ.get("SMARTGRADE_JOB_WORKERS", 4)))
+        return _queue
+
+
+# ── Built-in jobs ─────────────────────────────────────────────────────────────
+
+def _record(payload, entries):
+    if not payload.get("save_results"):
+        return
+    from results_store import get_results_store
+    store = get_results_store()
+    if store:
+        model = payload["model"]
+        if payload.get("cascade_model"):
+            model = f"{model} → {payload['cascade_model']}"
+        store.record_many(payload["question_text"], entries, model, payload["strictness"])
+
+
+def _evaluator(payload, secrets):
+    from evaluator import AnswerEvaluator
+    if not secrets.get("api_key"):
+        raise RuntimeError("API key not available — the job outlived the session that submitted it; resubmit")
+    return AnswerEvaluator(secrets["api_key"], payload["model"], payload["strictness"], payload["partial_credit"],
+                           use_cache=payload.get("use_cache", True), segmented=payload.get("segmented", False),
+                           prescore=payload.get("prescore", True), prescore_threshold=payload.get("prescore_threshold"),
+                           cascade_model=payload.get("cascade_model"))
+
+
+@handler("extract")
+def _extract(payload, data, secrets, report):
+    """
+    Text from an uploaded PDF or image (OCR when needed); payload["vision"]
+    requires an API key.  Text recording a failure is not reused, so the next
+    upload of the file (perhaps with a working key) is extracted afresh.
+    """
+    from utils import Upload, extraction_incomplete, read_file
+    if payload.get("vision") and not secrets.get("api_key"):
+        raise RuntimeError("API key not available — the job outlived the session that submitted it; resubmit")
+    text = read_file(Upload(data, payload["mime_type"]), api_key=secrets.get("api_key"))
+    return Transient(text) if extraction_incomplete(text, payload.get("vision")) else text
+
+
+@handler("evaluate")
+def _evaluate(payload, data, secrets, report):
+    """One answer sheet; graded questions are published as progress while they stream in."""
+    from question_paper import QuestionPaper
+    evaluator = _evaluator(payload, secrets)
+    expected  = len(QuestionPaper.parse(payload["question_text"]).questions)
+    questions = []
+    result    = {"error": "No result received"}
+    for kind, item in evaluator.evaluate_stream(payload["question_text"], payload["answer_text"]):
+        if kind == "question":
+            # A cascade may re-send a question once the larger model has re-graded it
+            questions = [q for q in questions if q.get("question_number") != item.get("question_number")] + [item]
+            report({"done": len(questions), "total": expected, "questions": questions})
+        else:
+            result = item
+    if "error" not in result:
+        _record(payload, [(result, None, payload["answer_text"])])
+    return result
+
+
+@handler("evaluate_class")
+def _evaluate_class(payload, data, secrets, report):
+    """A whole class against one paper; progress counts finished sheets."""
+    evaluator = _evaluator(payload, secrets)
+    names, sheets = payload["names"], payload["sheets"]
+    done, lock    = [0], threading.Lock()
+
+    def finished(i, result):
+        with lock:
+            done[0] += 1
+            report({"done": done[0], "total": len(sheets)})
+
+    start   = time.perf_counter()
+    results = evaluator.evaluate_batch(payload["question_text"], sheets,
+                                       max_workers=payload.get("concurrency", 4), on_result=finished)
+    elapsed = time.perf_counter() - start
+    _record(payload, [(r, name.rsplit(".", 1)[0], sheet) for name, sheet, r in zip(names, sheets, results)])
+    return {"results": results, "elapsed": elapsed}
@@ -0,0 +1,94 @@
+import streamlit as st
+import time
+from datetime import datetime
+from results_store import get_results_store
+
+st.set_page_config(page_title="SmartGrade AI · Analytics", page_icon="📊", layout="wide")
+
+st.markdown("""<style>
+.stApp{background:#0d1117;color:#e6edf3}
+div[data-testid="stSidebarContent"]{background:#0d1117}
+hr{border-color:#21262d} label{color:#8b949e!important}
+</style>""", unsafe_allow_html=True)
+
+st.markdown("## 📊 Class Analytics")
+st.caption("Every sheet graded with **📊 Save results for analytics** on (or through `cli.py`) is aggregated here.")
+
+store  = get_results_store()
+papers = store.papers() if store else []
+if not papers:
+    st.info("No stored results yet — grade some answer sheets first.")
+    st.stop()
+
+pick  = st.selectbox("📋 Question paper", range(len(papers)),
+                     format_func=lambda i: f"{papers[i]['title']} · {papers[i]['sheets']} sheets")
+paper = papers[pick]
+fp    = paper["paper"]
+bins  = st.sidebar.slider("Histogram bins", 5, 20, 10)
+
+start     = time.perf_counter()
+summary   = store.summary(fp)
+histogram = store.score_histogram(fp, bins)
+questions = store.question_stats(fp)
+missing   = store.top_points(fp, "missing", limit=10)
+covered   = store.top_points(fp, "covered", limit=10)
+elapsed   = time.perf_counter() - start
+
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Sheets", summary["sheets"])
+c2.metric("Mean", f"{summary['mean_pct']}%")
+c3.metric("Std dev", f"{summary['var_pct'] ** 0.5:.1f}")
+c4.metric("Range", f"{summary['min_pct']}–{summary['max_pct']}%")
+if paper["last_graded"]:
+    st.caption(f"Last graded {datetime.fromtimestamp(paper['last_graded']):%Y-%m-%d %H:%M} · "
+               f"aggregated in {elapsed * 1000:.0f} ms")
+
+st.markdown("---\n### 📈 Score Distribution")
+# Keyed by each band's lower bound so the x axis stays in numeric order
+st.bar_chart({"Sheets": {lo: n for lo, _, n in histogram}})
+
+st.markdown("### 📝 Per-question Statistics")
+texts = {number: text for number, text, _ in paper["questions"]}
+st.dataframe([{
+    "Q":             q["question"],
+    "Question":      texts.get(q["question"], "")[:80],
+    "Answers":       q["answers"],
+    "Max":           q["max_marks"],
+    "Mean":          q["mean_earned"],
+    "Variance":      q["var_earned"],
+    "Similarity %":  q["mean_similarity"],
+    "Full marks %":  q["full_marks_pct"],
+    "Zero %":        q["zero_pct"],
+} for q in questions], use_container_width=True, hide_index=True)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.markdown("#### ⚠️ Most Missed Key Points")
+    st.dataframe([{"Key point": p, "Sheets": n, "% of answers": share} for p, n, share in missing],
+                 use_container_width=True, hide_index=True)
+with col2:
+    st.markdown("#### ✅ Most Covered Key Points")
+    st.dataframe([{"Key point": p, "Sheets": n, "% of answers": share} for p, n, share in covered],
+                 use_container_width=True, hide_index=True)
+
+st.markdown("---\n### 🔎 Question Drill-down")
+numbers = [q["question"] for q in questions]
+if numbers:
+    number = st.selectbox("Question", numbers, format_func=lambda n: f"Q{n}. {texts.get(n, '')[:80]}")
+    st.bar_chart({"Answers": {lo: n for lo, _, n in store.similarity_histogram(fp, number, bins)}})
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"#### ⚠️ Missed on Q{number}")
+        st.dataframe([{"Key point": p, "Sheets": n, "% of answers": share}
+                      for p, n, share in store.top_points(fp, "missing", number)],
+                     use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown(f"#### ✅ Covered on Q{number}")
+        st.dataframe([{"Key point": p, "Sheets": n, "% of answers": share}
+                      for p, n, share in store.top_points(fp, "covered", number)],
+                     use_container_width=True, hide_index=True)
+
+with st.expander(f"👥 All students ({summary['sheets']})"):
+    st.dataframe([{"Student": s["student"], "%": s["pct"], "Score": f"{s['total_earned']} / {s['total_max']}",
+                   "Model": s["model"], "Strictness": s["strictness"]} for s in store.sheets(fp)],
+                 use_container_width=True, hide_index=True)
@@ -0,0 +1,120 @@
+import math, re
+from collections import Counter
+from dataclasses import dataclass
+
+DEFAULT_THRESHOLD   = 0.95  # suggested confidence for the opt-in off-topic skip
+RELEVANT_AT         = 0.15  # TF-IDF cosine at which an answer counts as on-topic
+WORDS_PER_MARK      = 10    # rough answer length one mark calls for
+OFF_TOPIC_MAX_TERMS = 3     # longer answers always go to the LLM, however unrelated they look
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his how
+i if in into is it its itself just me more most my no nor not now of off on once only or other our out over own same
+she should so some such than that the their them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your
+""".split())
+
+# Whole answers that can only mean "no answer".  Words like "none", "null", "nil" or "pass" are
+# left out: they are correct one-word answers to plenty of programming questions.
+PLACEHOLDERS = frozenset({
+    "", "na", "n a", "idk", "dunno", "no idea", "dont know", "don t know", "do not know", "i dont know",
+    "i don t know", "i do not know", "not attempted", "no answer", "unanswered", "xx", "xxx",
+})
+
+# "I don't know this answer", "not sure", "sorry, can't remember" — only when nothing else is said
+_NON_ANSWER_RE = re.compile(r"\b(?:don'?t|do not|not|no|never|can'?t|cannot)\s+(?:\w+\s+){0,2}?"
+                            r"(?:know|sure|idea|remember|attempt)", re.IGNORECASE)
+_FILLER_TERMS  = frozenset({"know", "sure", "idea", "remember", "attempt", "answer", "question", "sorry",
+                            "forgot", "forget", "don", "cannot"})
+
+
+def _stem(word):
+    """Crude suffix stripping so "learning" / "learned" / "learns" meet at "learn"."""
+    for suffix in ("ations", "ation", "ings", "ing", "ness", "ies", "ied", "ed", "es", "ly", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)] + ("y" if suffix in ("ies", "ied") else "")
+    return word
+
+
+def terms(text):
+    return [_stem(w) for w in _WORD_RE.findall((text or "").lower())
+            if w not in STOPWORDS and (len(w) > 1 or w.isdigit())]
+
+
+def is_blank(answer):
+    """
+    No answer at all: empty, punctuation / "[?]" only, or a placeholder like
+    "N/A" or "I don't know".  Anything with a digit, a lone character ("4",
+    "B") or other words may be a real short answer, so it is never blank.
+    """
+    words = _WORD_RE.findall((answer or "").lower())
+    if not words:
+        return True
+    if any(w.isdigit() for w in words) or (len(words) == 1 and len(words[0]) == 1):
+        return False
+    if " ".join(words) in PLACEHOLDERS:
+        return True
+    return bool(_NON_ANSWER_RE.search(answer)) and set(terms(answer)) <= _FILLER_TERMS
+
+
+@dataclass(frozen=True)
+class Assessment:
+    kind:       str         # "blank", "off_topic" or "substantive"
+    confidence: float       # confidence that the answer deserves 0 marks
+    relevance:  float       # TF-IDF cosine with the question
+
+
+class Prescorer:
+    """
+    Local pre-scoring for one question paper: decides, without an LLM call,
+    which answers are blank (and, opt-in, trivially off-topic) and can be scored 0.
+
+    Blank answers (see is_blank) are always skipped.  With a `threshold`, an
+    answer is also skipped as off-topic when it shares no vocabulary at all
+    with its question, is at most OFF_TOPIC_MAX_TERMS words long, and falls far
+    enough short of the length its marks call for that the confidence reaches
+    `threshold`.  Relevance is TF-IDF cosine similarity, with IDF taken over the
+    paper's questions so words every question shares ("explain", "describe")
+    count for little.  Lexical overlap cannot recognise a correct one-word
+    answer ("Photosynthesis"), which is why the off-topic skip is off by default.
+    """
+
+    def __init__(self, paper, threshold=None):
+        self.threshold = threshold
+        docs      = [set(terms(q.text)) for q in paper.questions]
+        df        = Counter(t for doc in docs for t in doc)
+        n         = len(docs)
+        self._idf = lambda t: math.log((1 + n) / (1 + df.get(t, 0))) + 1
+        self._vec = {q.number: self._vector(terms(q.text)) for q in paper.questions}
+
+    def _vector(self, words):
+        tf   = Counter(words)
+        vec  = {t: c * self._idf(t) for t, c in tf.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {t: v / norm for t, v in vec.items()}
+
+    def relevance(self, question, answer):
+        qv = self._vec.get(question.number) or self._vector(terms(question.text))
+        av = self._vector(terms(answer))
+        return sum(w * av.get(t, 0.0) for t, w in qv.items())
+
+    def assess(self, question, answer):
+        if is_blank(answer):
+            return Assessment("blank", 1.0, 0.0)
+        words      = terms(answer)
+        relevance  = self.relevance(question, answer)
+        expected   = WORDS_PER_MARK * max(float(question.max_marks), 1.0)
+        brevity    = max(0.0, 1 - len(words) / expected)
+        unrelated  = 1 - min(1.0, relevance / RELEVANT_AT)
+        confidence = round(brevity * unrelated, 3)
+        off_topic  = (self.threshold is not None and relevance == 0 and len(words) <= OFF_TOPIC_MAX_TERMS
+                      and not any(w.isdigit() for w in words) and confidence >= self.threshold)
+        return Assessment("off_topic" if off_topic else "substantive", confidence, round(relevance, 3))
+
+    def skip(self, question, answer):
+        """Assessment when the answer can be scored 0 without the LLM, else None."""
+        a = self.assess(question, answer)
+        return a if a.kind != "substantive" else None
@@ -0,0 +1,154 @@
+import hashlib, re
+from dataclasses import dataclass
+from functools import lru_cache
+
+DEFAULT_MARKS = 5
+
+# "Q1.", "Q 2)", "Question 3:", "4." / "4)" at the start of a line
+_QUESTION_RE = re.compile(r"^\s*(?:Q(?:uestion)?\s*\.?\s*(\d+)|(\d+)\s*[.)])\s*[.):\-]?\s*", re.IGNORECASE)
+
+# "(5 marks)", "(1 mark)", "[3]", "[3 marks]", "- 4 marks"
+_MARKS_RES = [
+    re.compile(r"\(\s*(\d+(?:\.\d+)?)\s*marks?\s*\)", re.IGNORECASE),
+    re.compile(r"\[\s*(\d+(?:\.\d+)?)\s*(?:marks?)?\s*\]", re.IGNORECASE),
+    re.compile(r"\b(\d+(?:\.\d+)?)\s*marks?\b", re.IGNORECASE),
+]
+
+
+@dataclass(frozen=True)
+class Question:
+    number:    int
+    text:      str
+    max_marks: float
+
+
+@dataclass(frozen=True)
+class QuestionPaper:
+    """
+    A question paper parsed locally into numbered questions with mark allocations.
+    Parsing is deterministic, so every student graded against the same paper sees
+    identical questions and totals.  Build one with QuestionPaper.parse(text).
+    """
+    text:      str
+    header:    str
+    questions: tuple
+
+    @classmethod
+    def parse(cls, text):
+        return _parse_cached(text or "")
+
+    @classmethod
+    def coerce(cls, paper):
+        """Accept either raw question paper text or an already-parsed QuestionPaper."""
+        return paper if isinstance(paper, cls) else cls.parse(paper)
+
+    @property
+    def total_marks(self):
+        return sum(q.max_marks for q in self.questions)
+
+    @property
+    def fingerprint(self):
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+    def get(self, number):
+        return next((q for q in self.questions if q.number == number), None)
+
+    def to_prompt(self):
+        """Compact one-line-per-question listing for the LLM prompt."""
+        return "\n".join(f"Q{q.number} [{_fmt(q.max_marks)} marks]: {q.text}" for q in self.questions)
+
+
+def _fmt(marks):
+    return int(marks) if float(marks).is_integer() else marks
+
+
+def _split_marks(text):
+    """Pull the first mark allocation out of a question's text."""
+    for rx in _MARKS_RES:
+        m = rx.search(text)
+        if m:
+            cleaned = (text[:m.start()] + text[m.end():]).strip()
+            return re.sub(r"[ \t]{2,}", " ", cleaned), float(m.group(1))
+    return text.strip(), DEFAULT_MARKS
+
+
+def _has_marks(text):
+    return any(rx.search(text) for rx in _MARKS_RES)
+
+
+def _split_blocks(text, restarts=False):
+    """
+    Split text on question numbering.  Returns (header_lines, [(start_line,
+    [[number, body], ...]), ...]): one run of blocks unless `restarts`, in which
+    case numbering that starts again at 1 opens a new run.
+    """
+    lines   = text.splitlines()
+    matches = [_QUESTION_RE.match(line) for line in lines]
+    # If any line uses the "Q1" / "Question 1" style, bare "1." lines are list items, not questions
+    q_style = any(m and m.group(1) for m in matches)
+
+    header, runs = [], []
+    for i, (line, m) in enumerate(zip(lines, matches)):
+        number = None
+        if m and (m.group(1) or not q_style):
+            number = int(m.group(1) or m.group(2))
+        blocks = runs[-1][1] if runs else None
+        # numbering must increase — a repeated or lower number continues the current question
+        if number is not None and blocks and number > blocks[-1][0]:
+            blocks.append([number, line[m.end():]])
+        elif number is not None and (not blocks or (restarts and number == 1)):
+            runs.append((i, [[number, line[m.end():]]]))
+        elif blocks:
+            blocks[-1][1] += "\n" + line
+        else:
+            header.append(line)
+    return header, runs
+
+
+def _question_run(text):
+    """
+    (header_lines, blocks) for a question paper.  When numbering restarts at 1
+    (e.g. numbered instructions before the questions) the one run that carries
+    mark allocations is kept: earlier runs join the header, later ones continue
+    its last question.  If no run or several runs carry marks the paper is
+    ambiguous, and no blocks are returned so the LLM parses it instead.
+    """
+    header, runs = _split_blocks(text, restarts=True)
+    if len(runs) < 2:
+        return header, runs[0][1] if runs else []
+
+    marked = [i for i, (_, blocks) in enumerate(runs) if any(_has_marks(body) for _, body in blocks)]
+    if len(marked) != 1:
+        return header, []
+    lines  = text.splitlines()
+    start, blocks = runs[marked[0]]
+    if marked[0] + 1 < len(runs):
+        blocks[-1][1] += "\n" + "\n".join(lines[runs[marked[0] + 1][0]:])
+    return lines[:start], blocks
+
+
+@lru_cache(maxsize=64)
+def _parse_cached(text):
+    header, blocks = _question_run(text)
+
+    questions = []
+    for number, body in blocks:
+        q_text, marks = _split_marks(body.strip())
+        if q_text:
+            questions.append(Question(number, q_text, _fmt(marks)))
+
+    return QuestionPaper(text=text, header="\n".join(header).strip(), questions=tuple(questions))
+
+
+def segment_answers(answer_sheet, paper=None):
+    """
+    Split an answer sheet into {question_number: answer_text} using the same
+    numbering conventions as question papers.  Anything before the first number
+    (name, roll no.) is dropped; with `paper`, numbers not on the paper are too.
+    Returns {} when the sheet has no recognisable numbering.
+    """
+    _, runs = _split_blocks(answer_sheet or "")
+    answers = {number: body.strip() for number, body in (runs[0][1] if runs else [])}
+    if paper is not None:
+        answers = {n: a for n, a in answers.items() if paper.get(n)}
+    return answers
@@ -0,0 +1,232 @@
+import hashlib, json, os, re, sqlite3, threading, time
+
+from cache import default_cache_path
+from question_paper import QuestionPaper
+
+
+def default_store_path():
+    """$SMARTGRADE_RESULTS_DB, else results.sqlite3 next to the caches."""
+    return os.environ.get("SMARTGRADE_RESULTS_DB") or default_cache_path("results")
+
+
+def _point_key(point):
+    """Key points are free text from the model — compare them case- and punctuation-insensitively."""
+    return re.sub(r"\s+", " ", str(point)).strip(" .;:,-").lower()
+
+
+def _variance(mean, mean_sq):
+    return max(0.0, (mean_sq or 0.0) - (mean or 0.0) ** 2)
+
+
+class ResultsStore:
+    """
+    Every successful evaluation, persisted to SQLite for class-level analytics.
+
+    Each sheet is flattened on write into one row per sheet, one per graded
+    question and one per covered / missing key point, all indexed by question
+    paper.  The aggregation methods are single GROUP BY queries, so means,
+    variances, histograms and top-N key points over thousands of sheets come
+    back in milliseconds without loading any result JSON.
+
+    A sheet is identified by (paper, student); recording the same student
+    against the same paper again replaces the earlier result.
+    """
+
+    def __init__(self, path=None):
+        path = path or default_store_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path  = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+                paper     TEXT PRIMARY KEY,
+                title     TEXT NOT NULL,
+                questions TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS sheets (
+                id           INTEGER PRIMARY KEY,
+                paper        TEXT NOT NULL REFERENCES papers(paper),
+                student      TEXT NOT NULL,
+                model        TEXT,
+                strictness   TEXT,
+                total_earned REAL NOT NULL,
+                total_max    REAL NOT NULL,
+                pct          REAL NOT NULL,
+                graded_at    REAL NOT NULL,
+                result       TEXT NOT NULL,
+                UNIQUE (paper, student));
+            CREATE TABLE IF NOT EXISTS answers (
+                sheet_id   INTEGER NOT NULL REFERENCES sheets(id) ON DELETE CASCADE,
+                paper      TEXT NOT NULL,
+                question   INTEGER NOT NULL,
+                max_marks  REAL NOT NULL,
+                earned     REAL NOT NULL,
+                similarity REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS points (
+                sheet_id INTEGER NOT NULL REFERENCES sheets(id) ON DELETE CASCADE,
+                paper    TEXT NOT NULL,
+                question INTEGER NOT NULL,
+                kind     TEXT NOT NULL,
+                point    TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS answers_paper ON answers(paper, question);
+            CREATE INDEX IF NOT EXISTS answers_sheet ON answers(sheet_id);
+            CREATE INDEX IF NOT EXISTS points_paper  ON points(paper, kind, question);
+            CREATE INDEX IF NOT EXISTS points_sheet  ON points(sheet_id);
+        """)
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    def record(self, question_paper, result, student=None, answer_sheet=None, model=None, strictness=None):
+        """
+        Store one evaluate() result.  `student` defaults to a hash of the answer
+        sheet, so anonymous re-gradings of the same sheet still replace each other.
+        Results with an "error" are ignored.  Returns the sheet id, or None.
+        """
+        ids = self.record_many(question_paper, [(result, student, answer_sheet)], model, strictness)
+        return ids[0] if ids else None
+
+    def record_many(self, question_paper, entries, model=None, strictness=None):
+        """Store many (result, student, answer_sheet) entries for one paper in a single transaction."""
+        paper = QuestionPaper.coerce(question_paper)
+        title = (paper.header.splitlines() or [""])[0].strip() or (paper.text.strip()[:60] or "Untitled paper")
+        now   = time.time()
+        ids   = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO papers (paper, title, questions) VALUES (?, ?, ?)",
+                                   (paper.fingerprint, title,
+                                    json.dumps([[q.number, q.text, q.max_marks] for q in paper.questions])))
+                for result, student, answer_sheet in entries:
+                    if not result or "error" in result:
+                        continue
+                    ids.append(self._insert(paper.fingerprint, result, student, answer_sheet, model, strictness, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def _insert(self, paper, result, student, answer_sheet, model, strictness, now):
+        """Caller holds the lock inside a transaction."""
+        if not student:
+            student = "sheet-" + hashlib.sha256((answer_sheet or json.dumps(result, sort_keys=True))
+                                                .encode("utf-8")).hexdigest()[:12]
+        te, tm = result.get("total_earned", 0), result.get("total_max", 0)
+        pct    = round((te / tm * 100) if tm else 0, 1)
+        self._conn.execute("DELETE FROM sheets WHERE paper = ? AND student = ?", (paper, student))
+        sheet_id = self._conn.execute(
+            "INSERT INTO sheets (paper, student, model, strictness, total_earned, total_max, pct, graded_at, result) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (paper, student, model, strictness, te, tm, pct, now, json.dumps(result))).lastrowid
+
+        answers, points = [], []
+        for i, q in enumerate(result.get("questions", []), 1):
+            number = q.get("question_number") or i
+            answers.append((sheet_id, paper, number, q.get("max_marks", 0), q.get("earned", 0),
+                            q.get("similarity_score", 0)))
+            for kind, field in (("covered", "key_points_covered"), ("missing", "missing_points")):
+                for point in {_point_key(p) for p in q.get(field) or []} - {""}:
+                    points.append((sheet_id, paper, number, kind, point))
+        self._conn.executemany("INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?)", answers)
+        self._conn.executemany("INSERT INTO points VALUES (?, ?, ?, ?, ?)", points)
+        return sheet_id
+
+    def delete_paper(self, paper):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for table in ("points", "answers", "sheets", "papers"):
+                self._conn.execute(f"DELETE FROM {table} WHERE paper = ?", (paper,))
+            self._conn.execute("COMMIT")
+
+    # ── Aggregates ────────────────────────────────────────────────────────────
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def papers(self):
+        """[{paper, title, questions, sheets, last_graded}] newest first."""
+        rows = self._query("""
+            SELECT p.paper, p.title, p.questions, COUNT(s.id), MAX(s.graded_at)
+            FROM papers p LEFT JOIN sheets s ON s.paper = p.paper
+            GROUP BY p.paper ORDER BY MAX(s.graded_at) DESC""")
+        return [{"paper": paper, "title": title, "questions": [tuple(q) for q in json.loads(questions)],
+                 "sheets": n, "last_graded": last} for paper, title, questions, n, last in rows]
+
+    def summary(self, paper):
+        """Sheet count and mean / variance / min / max percentage for one paper."""
+        n, mean, mean_sq, lo, hi = self._query(
+            "SELECT COUNT(*), AVG(pct), AVG(pct * pct), MIN(pct), MAX(pct) FROM sheets WHERE paper = ?", (paper,))[0]
+        return {"sheets": n, "mean_pct": round(mean or 0, 2), "var_pct": round(_variance(mean, mean_sq), 2),
+                "min_pct": lo or 0, "max_pct": hi or 0}
+
+    def score_histogram(self, paper, bins=10):
+        """Sheets per percentage band: [(low, high, count)] covering 0–100 in `bins` equal bands."""
+        counts = dict(self._query(
+            "SELECT MIN(CAST(pct * ? / 100 AS INTEGER), ? - 1), COUNT(*) FROM sheets WHERE paper = ? GROUP BY 1",
+            (bins, bins, paper)))
+        width = 100 / bins
+        return [(round(b * width, 1), round((b + 1) * width, 1), counts.get(b, 0)) for b in range(bins)]
+
+    def question_stats(self, paper):
+        """Per question: answers, max marks, mean / variance of earned marks and similarity, % full marks."""
+        rows = self._query("""
+            SELECT question, COUNT(*), MAX(max_marks),
+                   AVG(earned), AVG(earned * earned), AVG(similarity), AVG(similarity * similarity),
+                   AVG(earned >= max_marks), AVG(earned = 0)
+            FROM answers WHERE paper = ? GROUP BY question ORDER BY question""", (paper,))
+        return [{"question": q, "answers": n, "max_marks": mm,
+                 "mean_earned": round(me, 2), "var_earned": round(_variance(me, me2), 2),
+                 "mean_similarity": round(ms, 1), "var_similarity": round(_variance(ms, ms2), 1),
+                 "full_marks_pct": round(full * 100, 1), "zero_pct": round(zero * 100, 1)}
+                for q, n, mm, me, me2, ms, ms2, full, zero in rows]
+
+    def similarity_histogram(self, paper, question, bins=10):
+        """Answers per similarity band for one question: [(low, high, count)]."""
+        counts = dict(self._query(
+            "SELECT MIN(CAST(similarity * ? / 100 AS INTEGER), ? - 1), COUNT(*) FROM answers "
+            "WHERE paper = ? AND question = ? GROUP BY 1", (bins, bins, paper, question)))
+        width = 100 / bins
+        return [(round(b * width, 1), round((b + 1) * width, 1), counts.get(b, 0)) for b in range(bins)]
+
+    def top_points(self, paper, kind="missing", question=None, limit=10):
+        """Most frequent missing (or covered) key points: [(point, sheets, share of answers)]."""
+        where, params = "paper = ?", [paper]
+        if question is not None:
+            where += " AND question = ?"
+            params.append(question)
+        total = self._query(f"SELECT COUNT(*) FROM answers WHERE {where}", params)[0][0]
+        rows  = self._query(f"SELECT point, COUNT(*) FROM points WHERE {where} AND kind = ? "
+                            f"GROUP BY point ORDER BY COUNT(*) DESC, point LIMIT ?", params + [kind, limit])
+        return [(point, n, round(n / total * 100, 1) if total else 0.0) for point, n in rows]
+
+    def sheets(self, paper):
+        """[{student, pct, total_earned, total_max, model, strictness, graded_at}] best first."""
+        rows = self._query("SELECT student, pct, total_earned, total_max, model, strictness, graded_at "
+                           "FROM sheets WHERE paper = ? ORDER BY pct DESC, student", (paper,))
+        keys = ("student", "pct", "total_earned", "total_max", "model", "strictness", "graded_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def result(self, paper, student):
+        row = self._query("SELECT result FROM sheets WHERE paper = ? AND student = ?", (paper, student))
+        return json.loads(row[0][0]) if row else None
+
+
+_store      = None
+_store_lock = threading.Lock()
+
+
+def get_results_store():
+    """Process-wide ResultsStore at default_store_path(), or None if it cannot be opened."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = ResultsStore()
+            except (OSError, sqlite3.Error) as e:
+                print(f"[Results store disabled]: {e}")
+                return None
+        return _store
@@ -0,0 +1,229 @@
+import json, os, re, threading, time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the span duration histogram, Prometheus-style
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+RECENT  = 256               # finished spans kept for the trace view
+
+ENABLED = os.environ.get("SMARTGRADE_TELEMETRY", "1") != "0"
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+# Spans and counters are keyed by (name, sorted label pairs).  Spans recorded in
+# worker processes (Tesseract, batch PDF rendering) stay in those processes; the
+# caller's span around the hand-off still measures the wall time.
+
+_spans    = {}              # key → [count, total_s, max_s, errors, bucket counts]
+_counters = {}              # key → value
+_recent   = deque(maxlen=RECENT)
+_lock     = threading.Lock()
+_local    = threading.local()
+_started  = time.time()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def observe(name, seconds, error=None, **labels):
+    """Record one finished `name` span of `seconds` (e.g. timed elsewhere)."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        stat = _spans.get(key)
+        if stat is None:
+            stat = _spans[key] = [0, 0.0, 0.0, 0, [0] * len(BUCKETS)]
+        stat[0] += 1
+        stat[1] += seconds
+        stat[2]  = max(stat[2], seconds)
+        stat[3] += error is not None
+        stat[4][next(i for i, bound in enumerate(BUCKETS) if seconds <= bound)] += 1
+
+
+def count(name, amount=1, **labels):
+    """Add `amount` to the `name` counter (fallbacks, retries, cache hits, ...)."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Time the enclosed block as a `name` span.  An exception escaping the block
+    is counted as an error on the span and re-raised.  Spans nest per thread:
+    the trace view records each span's enclosing span as its parent.
+    """
+    if not ENABLED:
+        yield
+        return
+    stack  = _local.__dict__.setdefault("stack", [])
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    wall, start, error = time.time(), time.perf_counter(), None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - start
+        observe(name, elapsed, error, **labels)
+        with _lock:
+            _recent.append({"span": name, "labels": dict(_key(name, labels)[1]), "parent": parent,
+                            "start": round(wall, 6), "duration_s": round(elapsed, 6),
+                            "thread": threading.current_thread().name, "error": error})
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _recent.clear()
+
+
+# ── Export ────────────────────────────────────────────────────────────────────
+
+def _quantile(buckets, n, q):
+    """Upper bound of the histogram bucket holding the q-quantile (approximate)."""
+    seen = 0
+    for bound, c in zip(BUCKETS, buckets):
+        seen += c
+        if seen >= q * n:
+            return bound
+    return BUCKETS[-1]
+
+
+def snapshot(recent=True):
+    """
+    JSON-serialisable view: per-span count / total / mean / p95 / max / errors
+    (slowest total first), every counter, and the most recently finished spans.
+    """
+    with _lock:
+        spans    = [(k, list(v[:4]) + [list(v[4])]) for k, v in _spans.items()]
+        counters = list(_counters.items())
+        traces   = list(_recent) if recent else []
+    rows = []
+    for (name, labels), (n, total, longest, errors, buckets) in spans:
+        p95 = _quantile(buckets, n, 0.95)
+        rows.append({"span": name, "labels": dict(labels), "count": n, "total_s": round(total, 4),
+                     "mean_s": round(total / n, 4) if n else 0.0,
+                     "p95_s": round(min(p95, longest), 4),
+                     "max_s": round(longest, 4), "errors": errors,
+                     "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(BUCKETS, buckets)}})
+    rows.sort(key=lambda r: r["total_s"], reverse=True)
+    return {"uptime_s": round(time.time() - _started, 1), "spans": rows,
+            "counters": sorted(({"counter": name, "labels": dict(labels), "value": round(value, 4)}
+                                for (name, labels), value in counters),
+                               key=lambda c: (c["counter"], sorted(c["labels"].items()))),
+            "recent": traces}
+
+
+def to_json(**kwargs):
+    return json.dumps(snapshot(), **kwargs)
+
+
+def _metric_name(name):
+    return "smartgrade_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(pairs, **extra):
+    pairs = list(pairs) + list(extra.items())
+    if not pairs:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def to_prometheus():
+    """Prometheus text exposition: one span-duration histogram family, one counter family per name."""
+    with _lock:
+        spans    = sorted((k, list(v[:4]) + [list(v[4])]) for k, v in _spans.items())
+        counters = sorted(_counters.items())
+
+    lines = ["# HELP smartgrade_span_seconds Duration of instrumented spans.",
+             "# TYPE smartgrade_span_seconds histogram"]
+    for (name, labels), (n, total, _, _, buckets) in spans:
+        cumulative = 0
+        for bound, c in zip(BUCKETS, buckets):
+            cumulative += c
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"smartgrade_span_seconds_bucket{_labels(labels, span=name, le=le)} {cumulative}")
+        lines.append(f"smartgrade_span_seconds_sum{_labels(labels, span=name)} {total:.6f}")
+        lines.append(f"smartgrade_span_seconds_count{_labels(labels, span=name)} {n}")
+    lines += ["# HELP smartgrade_span_errors_total Spans that ended in an exception.",
+              "# TYPE smartgrade_span_errors_total counter"]
+    lines += [f"smartgrade_span_errors_total{_labels(labels, span=name)} {errors}"
+              for (name, labels), (_, _, _, errors, _) in spans]
+
+    declared = set()
+    for (name, labels), value in counters:
+        metric = _metric_name(name) + "_total"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write(path):
+    """Dump the current metrics to `path`: Prometheus text for *.prom, JSON otherwise."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(to_prometheus() if path.endswith(".prom") else to_json(indent=2))
+
+
+# ── HTTP endpoint ─────────────────────────────────────────────────────────────
+
+_server      = None
+_server_lock = threading.Lock()
+
+
+def serve(port, host="127.0.0.1"):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json from a daemon thread.
+    Idempotent: a second call returns the running server.
+    """
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body, ctype = to_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body, ctype = to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), Handler)
+            threading.Thread(target=_server.serve_forever, name="smartgrade-metrics", daemon=True).start()
+        return _server
+
+
+def serve_from_env():
+    """serve() on $SMARTGRADE_METRICS_PORT (host $SMARTGRADE_METRICS_HOST), if set.  Returns the server or None."""
+    port = os.environ.get("SMARTGRADE_METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return serve(port, os.environ.get("SMARTGRADE_METRICS_HOST", "127.0.0.1"))
+    except OSError as e:
+        print(f"[Metrics endpoint warning]: {e}")
+        return None
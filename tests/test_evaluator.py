@@ -0,0 +1,119 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import evaluator as evaluator_module
+from cache import MemoryCache
+from evaluator import AnswerEvaluator, _question_number
+from question_paper import QuestionPaper
+
+PAPER = QuestionPaper.parse("""Quiz
+
+Q1. (5 marks) What is Artificial Intelligence?
+
+Q2. (5 marks) Explain supervised learning.
+""")
+
+
+@pytest.fixture
+def evaluator():
+    return AnswerEvaluator("test-key", use_cache=False)
+
+
+@pytest.mark.parametrize("value, number", [(1, 1), ("1", 1), ("Q1", 1), ("Question 2", 2), (2.0, 2), ("Q", None),
+                                           (None, None), (True, None)])
+def test_question_number(value, number):
+    assert _question_number(value) == number
+
+
+def test_score_accepts_prompt_labels(evaluator):
+    data = evaluator._score({"questions": [
+        {"question_number": "Q1", "student_answer": "a", "similarity_score": 80},
+        {"question_number": "Q2", "student_answer": "b", "similarity_score": 60},
+    ]}, PAPER)
+    assert [q["earned"] for q in data["questions"]] == [4.0, 3.0]
+    assert "failed_questions" not in data
+
+
+def test_unmatched_entries_fail_the_missing_questions(evaluator):
+    data = evaluator._score({"questions": [
+        {"question_number": 1, "student_answer": "a", "similarity_score": 80},
+        {"question_number": "second", "student_answer": "b", "similarity_score": 60},
+    ]}, PAPER)
+    assert data["failed_questions"] == [2]
+    assert data["questions"][1]["feedback"].startswith("Grading failed")
+
+
+def test_skipped_question_is_unanswered_not_failed(evaluator):
+    data = evaluator._score({"questions": [{"question_number": 1, "student_answer": "a", "similarity_score": 80}]},
+                            PAPER)
+    assert "failed_questions" not in data
+    assert data["questions"][1]["feedback"] == "No answer found for this question."
+
+
+def test_plan_never_fans_out_an_unnumbered_sheet():
+    paper     = QuestionPaper.parse("Quiz\n\n" + "\n\n".join(f"Q{i}. (5 marks) Explain topic {i}." for i in range(1, 21)))
+    evaluator = AnswerEvaluator("test-key", "llama-3.1-8b-instant", use_cache=False)
+    sheet     = " ".join(["word"] * 12000)
+    assert len(evaluator.plan(paper, sheet)) == 1
+
+    numbered = "\n\n".join(f"Q{i}. " + " ".join(["word"] * 600) for i in range(1, 21))
+    chunks   = evaluator.plan(paper, numbered)
+    assert len(chunks) > 1
+    assert sum(len(sub.questions) for sub, *_ in chunks) == 20
+
+
+@pytest.mark.parametrize("raw", ['[{"question_number": 1}]', '"text"', "42"])
+def test_parse_json_rejects_non_objects(raw):
+    with pytest.raises(ValueError):
+        AnswerEvaluator._parse_json(raw)
+
+
+def test_score_rejects_non_list_questions(evaluator):
+    with pytest.raises(ValueError):
+        evaluator._score({"questions": "none"}, PAPER)
+
+
+def _stream(text, size=40):
+    for i in range(0, len(text), size):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + size]))])
+
+
+def test_truncated_stream_fails_the_missing_questions(monkeypatch):
+    reply = json.dumps({"overall_feedback": "ok", "questions": [
+        {"question_number": 1, "student_answer": "a", "similarity_score": 80, "feedback": "good"},
+        {"question_number": 2, "student_answer": "b", "similarity_score": 60, "feedback": "fair"},
+    ]})
+    cut = reply[:reply.index('{"question_number": 2') + 30]
+    monkeypatch.setattr(evaluator_module, "chat_completion", lambda *args, **kwargs: _stream(cut))
+
+    cache     = MemoryCache()
+    evaluator = AnswerEvaluator("test-key", cache=cache, prescore=False)
+    events    = list(evaluator.evaluate_stream(PAPER, "Q1. a\n\nQ2. b"))
+    kind, result = events[-1]
+    assert kind == "result"
+    assert result["failed_questions"] == [2]
+    assert result["questions"][0]["earned"] == 4.0
+    assert result["questions"][1]["feedback"].startswith("Grading failed")
+    assert cache.get(evaluator.cache_key(PAPER, "Q1. a\n\nQ2. b")) is None
+
+
+def _reply(questions):
+    content = json.dumps({"overall_feedback": "ok", "questions": questions})
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_cascade_keeps_first_pass_grades_the_large_model_left_out(monkeypatch):
+    def chat_completion(client, model, **kwargs):
+        if model == "small":
+            return _reply([{"question_number": n, "student_answer": "x", "similarity_score": 50, "feedback": "meh"}
+                           for n in (1, 2)])
+        return _reply([{"question_number": 1, "student_answer": "x", "similarity_score": 90, "feedback": "good"}])
+    monkeypatch.setattr(evaluator_module, "chat_completion", chat_completion)
+
+    evaluator = AnswerEvaluator("test-key", "small", use_cache=False, prescore=False, cascade_model="large")
+    result    = evaluator.evaluate(PAPER, "Q1. x\n\nQ2. x")
+    assert [q["similarity_score"] for q in result["questions"]] == [90, 50]
+    assert result["questions"][1]["feedback"] == "meh"
+    assert result["escalated_questions"] == [1]
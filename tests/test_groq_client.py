@@ -0,0 +1,65 @@
+import pytest
+
+import groq_client
+
+
+class _Error(Exception):
+    status_code = 429
+
+
+class _Client:
+    """Stand-in Groq client whose every request is rejected with a 429."""
+
+    def __init__(self, api_key):
+        self.api_key     = api_key
+        self.chat        = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        raise _Error("rate limited")
+
+
+@pytest.fixture
+def limited_model():
+    model = "test-model"
+    groq_client.set_rate_limit(model, None, 10_000)
+    yield model
+    groq_client.set_rate_limit(model, None, None)
+
+
+def test_failed_attempts_return_their_reservation(limited_model):
+    with pytest.raises(_Error):
+        groq_client.chat_completion(_Client("key-a"), model=limited_model, max_tokens=1000, max_retries=3,
+                                    base_delay=0, max_delay=0, messages=[{"role": "user", "content": "hi"}])
+    bucket = groq_client.get_limiter(limited_model, "key-a").tokens
+    bucket._refill()
+    assert bucket.level == pytest.approx(bucket.capacity, abs=1)
+
+
+def test_limiters_are_per_api_key(limited_model):
+    a = groq_client.get_limiter(limited_model, "key-a")
+    b = groq_client.get_limiter(limited_model, "key-b")
+    assert a is not b
+    a.acquire(9_000)
+    assert b.tokens.wait_time(9_000) == 0
+
+
+def test_parse_rate_limits():
+    assert groq_client.parse_rate_limits("1000/300000") == {"*": (1000, 300000)}
+    assert groq_client.parse_rate_limits("llama-3.1-8b-instant=14400/-, meta-llama/llama-4-scout-17b-16e-instruct=0/5000") == {
+        "llama-3.1-8b-instant": (14400, None), "meta-llama/llama-4-scout-17b-16e-instruct": (None, 5000)}
+    for bad in ("1000", "a=1/x", "-5/10"):
+        with pytest.raises(ValueError):
+            groq_client.parse_rate_limits(bad)
+
+
+def test_wildcard_override_applies_to_every_model(monkeypatch):
+    monkeypatch.setattr(groq_client, "_overrides", {})
+    monkeypatch.setattr(groq_client, "_limiters", {})
+    limiter = groq_client.get_limiter("llama-3.1-8b-instant", "k")
+    groq_client.set_rate_limit("*", 1000, 250_000)
+    groq_client.set_rate_limit("gemma2-9b-it", 50, None)
+    assert groq_client.rate_limit("llama-3.1-8b-instant") == (1000, 250_000)
+    assert groq_client.rate_limit("gemma2-9b-it") == (50, None)
+    assert groq_client.get_limiter("llama-3.1-8b-instant", "k") is not limiter
+    assert groq_client.get_limiter("llama-3.1-8b-instant", "k").requests.capacity == 1000
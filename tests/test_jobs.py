@@ -0,0 +1,33 @@
+import pytest
+
+import utils
+from jobs import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), workers=1, poll_s=0.05)
+    yield q
+    q.close()
+
+
+def _extract(queue, key="extract:True:abc"):
+    job_id = queue.submit("extract", {"mime_type": "image/png", "vision": True}, data=b"img",
+                          secrets={"api_key": "k"}, key=key)
+    return job_id, queue.wait(job_id, timeout=10)
+
+
+def test_successful_extraction_is_reused(queue, monkeypatch):
+    monkeypatch.setattr(utils, "read_file", lambda f, api_key=None: "Q1. answer")
+    first, job = _extract(queue)
+    assert job["status"] == "done" and job["result"] == "Q1. answer"
+    assert _extract(queue)[0] == first
+
+
+@pytest.mark.parametrize("text", ["[OCR error: 401 invalid api key]", "Q1. answer\n" + utils.TESSERACT_NOTE,
+                                  "[ERROR] No OCR method available."])
+def test_failed_extraction_is_not_reused(queue, monkeypatch, text):
+    monkeypatch.setattr(utils, "read_file", lambda f, api_key=None: text)
+    first, job = _extract(queue)
+    assert job["status"] == "done" and job["result"] == text
+    assert _extract(queue)[0] != first
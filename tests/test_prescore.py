@@ -0,0 +1,76 @@
+import pytest
+
+from evaluator import AnswerEvaluator
+from prescore import DEFAULT_THRESHOLD, Prescorer, is_blank
+from question_paper import QuestionPaper
+
+PAPER = QuestionPaper.parse("""Biology and ML quiz
+
+Q1. (2 marks) How many chambers does the heart have?
+
+Q2. (5 marks) Name the process by which green plants make their food.
+
+Q3. (5 marks) Explain supervised learning.
+
+Q4. (1 marks) Which option is correct: A, B or C?
+""")
+Q1, Q2, Q3, Q4 = PAPER.questions
+
+
+@pytest.mark.parametrize("answer", ["", "   ", "[?]", "...", "N/A", "I don't know", "I do not know this answer."])
+def test_placeholders_are_blank(answer):
+    assert is_blank(answer)
+
+
+@pytest.mark.parametrize("answer", ["4", "B", "x", "no", "Yes it is", "Photosynthesis", "Not 3, it is 4",
+                                    "None", "null", "nil", "pass", "blank", "skip"])
+def test_short_real_answers_are_not_blank(answer):
+    assert not is_blank(answer)
+
+
+@pytest.mark.parametrize("question, answer", [
+    (Q1, "4"),
+    (Q2, "Photosynthesis"),
+    (Q3, "It uses labelled data to train a model that predicts outputs for new inputs."),
+    (Q4, "B"),
+])
+def test_correct_short_answers_reach_the_llm_by_default(question, answer):
+    assert Prescorer(PAPER).skip(question, answer) is None
+
+
+@pytest.mark.parametrize("threshold", [DEFAULT_THRESHOLD, 0.5])
+def test_off_topic_skip_never_takes_answers_with_overlap_digits_or_length(threshold):
+    scorer = Prescorer(PAPER, threshold)
+    assert scorer.skip(Q1, "4") is None
+    assert scorer.skip(Q3, "It uses labelled data to train a model that predicts outputs for new inputs.") is None
+    assert scorer.skip(Q3, "Learning from labelled examples") is None
+
+
+def test_off_topic_skip_is_opt_in():
+    assert Prescorer(PAPER).skip(Q3, "pizza") is None
+    assessment = Prescorer(PAPER, DEFAULT_THRESHOLD).skip(Q3, "pizza")
+    assert assessment is not None and assessment.kind == "off_topic"
+
+
+def test_blank_answers_are_skipped():
+    assessment = Prescorer(PAPER).skip(Q1, "I don't know")
+    assert assessment is not None and assessment.kind == "blank"
+
+
+def test_evaluator_sends_short_answers_and_prescores_blanks():
+    evaluator = AnswerEvaluator("test-key", use_cache=False)
+    sheet     = "Q1. 4\n\nQ2. Photosynthesis\n\nQ3. N/A\n\nQ4. B"
+    local, rest, sent = evaluator._prescore(PAPER, sheet)
+    assert [q["question_number"] for q in local] == [3]
+    assert [q.number for q in rest.questions] == [1, 2, 4]
+    assert sent == sheet
+
+    local, rest, _ = AnswerEvaluator("test-key", use_cache=False, prescore=False)._prescore(PAPER, sheet)
+    assert local == [] and rest is PAPER
+
+
+def test_prescoring_never_rewrites_the_sheet():
+    # The student's own list in answer 1 would read as question numbers if the sheet were re-segmented
+    sheet = "1. Traits of AI:\n1) problem solving\n2) learning\n3) planning\n\n2. Photosynthesis\n\n3. x\n\n4. I don't know"
+    _, rest, sent = AnswerEvaluator("test-key", use_cache=False)._prescore(PAPER, sheet)
+    assert sent == sheet
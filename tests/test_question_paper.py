@@ -0,0 +1,38 @@
+from question_paper import QuestionPaper
+
+INSTRUCTIONS = """Instructions:
+1. Answer all questions.
+2. Write legibly.
+
+1. What is AI? (5 marks)
+2. Define SL. (3 marks)
+3. What is overfitting? (2 marks)"""
+
+
+def test_numbered_instructions_before_questions():
+    paper = QuestionPaper.parse(INSTRUCTIONS)
+    assert [(q.number, q.text, q.max_marks) for q in paper.questions] == [
+        (1, "What is AI?", 5), (2, "Define SL.", 3), (3, "What is overfitting?", 2)]
+    assert paper.total_marks == 10
+    assert paper.header.startswith("Instructions:\n1. Answer all questions.")
+
+
+def test_unmarked_list_after_the_questions_stays_in_the_last_question():
+    paper = QuestionPaper.parse("1. Define AI. (2 marks)\n2. Name two of the following (4 marks):\n1. search\n2. planning")
+    assert [q.number for q in paper.questions] == [1, 2]
+    assert paper.questions[1].text.endswith("1. search\n2. planning")
+    assert paper.total_marks == 6
+
+
+def test_ambiguous_restart_is_left_to_the_llm():
+    # Two sections numbered from 1, both with marks: no single run is the question list
+    paper = QuestionPaper.parse("Section A\n1. Define AI. (2 marks)\n2. Define ML. (2 marks)\n"
+                                "Section B\n1. Explain SL. (5 marks)\n2. Explain RL. (5 marks)")
+    assert paper.questions == ()
+
+
+def test_single_sequence_is_unchanged():
+    paper = QuestionPaper.parse("Quiz\n\nQ1. (5 marks) What is AI?\n1. give an example\n\nQ2. [3] Define ML.")
+    assert [(q.number, q.max_marks) for q in paper.questions] == [(1, 5), (2, 3)]
+    assert "give an example" in paper.questions[0].text
+
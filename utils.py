@@ -1,23 +1,60 @@
 import base64
+import hashlib
+import mimetypes
+import os
+import threading
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor
+from functools import lru_cache
 
+import telemetry
 
-# ── Shared vision OCR helper ──────────────────────────────────────────────────
 
-def _ocr_image_bytes(img_bytes, mime_type="image/jpeg", api_key=None, context=""):
+# ── OCR result cache ──────────────────────────────────────────────────────────
+
+OCR_MODEL          = "meta-llama/llama-4-scout-17b-16e-instruct"
+OCR_PROMPT_VERSION = 2          # bump when the Vision prompt or Tesseract preprocessing changes
+
+_ocr_cache      = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
     """
-    OCR a raw image (bytes).  Tries Groq Vision first, then Tesseract.
-    Returns extracted text string.
+    Shared on-disk OCR cache (see cache.DiskCache), created on first use.
+    Size cap comes from $SMARTGRADE_OCR_CACHE_MB (default 256).
+    Returns None if the cache directory is not writable.
     """
-    b64 = base64.b64encode(img_bytes).decode("utf-8")
+    global _ocr_cache
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            try:
+                from cache import DiskCache, default_cache_path
+                max_mb     = float(os.environ.get("SMARTGRADE_OCR_CACHE_MB", 256))
+                _ocr_cache = DiskCache(default_cache_path("ocr"), max_bytes=int(max_mb * 1024 * 1024))
+            except Exception as e:
+                print(f"[OCR cache warning]: {e}")
+                _ocr_cache = False
+        return _ocr_cache or None
 
-    # Primary: Groq Vision LLM ------------------------------------------------
-    if api_key:
-        try:
-            from groq import Groq
-            client = Groq(api_key=api_key)
-            ctx_note = f" ({context})" if context else ""
-            response = client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
+
+def _ocr_cache_key(engine, img_bytes):
+    digest = hashlib.sha256(img_bytes).hexdigest()
+    return f"{engine}:v{OCR_PROMPT_VERSION}:{digest}"
+
+
+# ── Shared vision OCR helper ──────────────────────────────────────────────────
+
+def _vision_ocr(img_bytes, mime_type, api_key, context=""):
+    """Transcribe an image with the Groq Vision model.  Returns text, or "" on failure."""
+    with telemetry.span("ocr.base64"):
+        b64 = base64.b64encode(img_bytes).decode("utf-8")
+    try:
+        from groq_client import chat_completion, get_client
+        ctx_note = f" ({context})" if context else ""
+        with telemetry.span("ocr.vision"):
+            response = chat_completion(
+                get_client(api_key),
+                model=OCR_MODEL,
                 messages=[{
                     "role": "user",
                     "content": [
@@ -40,26 +77,135 @@ def _ocr_image_bytes(img_bytes, mime_type="image/jpeg", api_key=None, context=""
                 max_tokens=4096,
                 temperature=0.1,
             )
-            text = response.choices[0].message.content.strip()
-            if text:
-                return text
-        except Exception as e:
-            print(f"[Vision OCR warning]{' ' + context if context else ''}: {e}")
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        telemetry.count("ocr.vision_errors", error=type(e).__name__)
+        print(f"[Vision OCR warning]{' ' + context if context else ''}: {e}")
+        return ""
+
+
+def _preprocess_for_tesseract(img, contrast=2.0):
+    """
+    Grayscale → contrast stretch → sharpen.  The stretch is one lookup-table pass
+    (same mapping as ImageEnhance.Contrast) and pages that are already grayscale
+    are not converted, so no intermediate full-size copies are made.
+    """
+    from PIL import ImageFilter
+
+    if img.mode != "L":
+        img = img.convert("L")
+    hist = img.histogram()
+    mean = sum(i * c for i, c in enumerate(hist)) / (sum(hist) or 1)
+    lut  = [min(255, max(0, int(mean + contrast * (v - mean) + 0.5))) for v in range(256)]
+    return img.point(lut).filter(ImageFilter.SHARPEN)
+
+
+def _tesseract_ocr(img_bytes):
+    """Preprocess, then Tesseract.  Raises ImportError if unavailable."""
+    import io
+    from PIL import Image
+    import pytesseract
+
+    img = _preprocess_for_tesseract(Image.open(io.BytesIO(img_bytes)))
+    return pytesseract.image_to_string(img, config=r"--oem 1 --psm 6").strip()
+
+
+# ── Tesseract process pool ────────────────────────────────────────────────────
+
+_tesseract_pool      = None
+_tesseract_pool_lock = threading.Lock()
 
-    # Fallback: Tesseract OCR -------------------------------------------------
-    try:
-        import io
-        from PIL import Image, ImageFilter, ImageEnhance
-        import pytesseract
 
-        img = Image.open(io.BytesIO(img_bytes)).convert("L")
-        img = ImageEnhance.Contrast(img).enhance(2.0)
-        img = img.filter(ImageFilter.SHARPEN)
+def _tesseract_worker_init():
+    # One Tesseract per core: stop each one from spinning up its own OpenMP threads
+    os.environ["OMP_THREAD_LIMIT"] = "1"
 
-        text = pytesseract.image_to_string(img, config=r"--oem 1 --psm 6").strip()
+
+def _discard_tesseract_pool(pool, error):
+    """Forget a pool whose worker died so the next caller starts a fresh one."""
+    global _tesseract_pool
+    print(f"[Tesseract pool warning]: {error} — falling back to in-thread OCR")
+    with _tesseract_pool_lock:
+        if _tesseract_pool is pool:
+            _tesseract_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _tesseract_processes():
+    return int(os.environ.get("SMARTGRADE_OCR_PROCESSES") or os.cpu_count() or 1)
+
+
+def get_tesseract_pool():
+    """
+    Shared process pool for offline OCR, one worker per core
+    ($SMARTGRADE_OCR_PROCESSES to override).  Returns None if processes
+    cannot be started here, in which case Tesseract runs in-thread.
+    """
+    global _tesseract_pool
+    with _tesseract_pool_lock:
+        if _tesseract_pool is None:
+            try:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # spawn, not fork: the app process is full of threads
+                _tesseract_pool = ProcessPoolExecutor(max_workers=_tesseract_processes(),
+                                                      initializer=_tesseract_worker_init,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+            except Exception as e:
+                print(f"[Tesseract pool warning]: {e}")
+                _tesseract_pool = False
+        return _tesseract_pool or None
+
+
+# Markers the extractors leave in their text when a file, page or OCR engine failed
+EXTRACTION_ERRORS = ("[ERROR]", "[PDF extraction error", "[OCR error", "[Render error")
+TESSERACT_NOTE    = "[Note: Tesseract used — provide Groq API key for better handwriting accuracy]"
+
+
+def extraction_incomplete(text, vision=False):
+    """True if `text` records a failed extraction — or, when Groq Vision was asked for, a Tesseract fallback."""
+    return any(marker in text for marker in EXTRACTION_ERRORS) or (vision and TESSERACT_NOTE in text)
+
+
+def _ocr_image_bytes(img_bytes, mime_type="image/jpeg", api_key=None, context="", use_cache=True,
+                     tesseract_pool=None):
+    """
+    OCR a raw image (bytes).  Tries Groq Vision first, then Tesseract.
+    Results are cached on disk by image hash + engine, so the same scan is only
+    OCR'd once; pass use_cache=False to force a fresh read.  With `tesseract_pool`
+    the Tesseract step runs in that process pool instead of the calling thread.
+    Returns extracted text string.
+    """
+    cache = get_ocr_cache() if use_cache else None
+
+    # Primary: Groq Vision LLM ------------------------------------------------
+    if api_key:
+        key = _ocr_cache_key(f"vision:{OCR_MODEL}", img_bytes)
+        if cache and (hit := cache.get(key)) is not None:
+            telemetry.count("ocr.cache_hits", engine="vision")
+            return hit
+        text = _vision_ocr(img_bytes, mime_type, api_key, context)
         if text:
-            return text + "\n[Note: Tesseract used — provide Groq API key for better handwriting accuracy]"
-        return ""
+            if cache: cache.set(key, text)
+            return text
+
+    # Fallback: Tesseract OCR -------------------------------------------------
+    telemetry.count("ocr.fallbacks", reason="vision_failed" if api_key else "no_api_key")
+    key = _ocr_cache_key("tesseract", img_bytes)
+    if cache and (hit := cache.get(key)) is not None:
+        telemetry.count("ocr.cache_hits", engine="tesseract")
+        return hit
+    try:
+        text = None
+        with telemetry.span("ocr.tesseract", pooled=tesseract_pool is not None):
+            if tesseract_pool is not None:
+                try:
+                    text = tesseract_pool.submit(_tesseract_ocr, img_bytes).result()
+                except BrokenExecutor as e:
+                    telemetry.count("ocr.pool_failures")
+                    _discard_tesseract_pool(tesseract_pool, e)
+            if text is None:
+                text = _tesseract_ocr(img_bytes)
     except ImportError:
         return (
             "[ERROR] No OCR method available. "
@@ -69,44 +215,152 @@ def _ocr_image_bytes(img_bytes, mime_type="image/jpeg", api_key=None, context=""
     except Exception as e:
         return f"[OCR error: {e}]"
 
+    if text:
+        text += "\n" + TESSERACT_NOTE
+    if cache: cache.set(key, text)
+    return text
+
 
 # ── PDF extraction ────────────────────────────────────────────────────────────
 
-def extract_text_from_pdf(uploaded_file, api_key=None):
+PAGE_TEXT_MIN_CHARS  = 30           # text layer needed before a page counts as digital…
+PAGE_IMAGE_MAX_COVER = 0.5          # …unless images cover more than this share of it
+RENDER_TARGET_PX     = 2000         # long side of a rendered page, in pixels
+RENDER_DPI_RANGE     = (100, 300)
+MAX_IMAGE_BYTES      = 1_500_000    # JPEG size cap before base64 (Groq allows ~4 MB encoded)
+JPEG_QUALITIES       = (85, 70, 55)
+
+
+def _image_cover(page):
+    """Share of the page area covered by embedded images (0–1)."""
+    px0, py0, px1, py1 = page.rect
+    page_area = max((px1 - px0) * (py1 - py0), 1)
+    covered   = 0
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        covered += max(0, min(x1, px1) - max(x0, px0)) * max(0, min(y1, py1) - max(y0, py0))
+    return min(1.0, covered / page_area)
+
+
+def _page_needs_ocr(page, text):
     """
-    Extract text from a PDF.
-    • Digital PDFs  → direct text via PyMuPDF (fast, accurate)
-    • Scanned/image PDFs (handwriting) → render each page as JPEG and OCR it
+    OCR a page when it is mostly picture (scans, photos of handwriting), or when
+    its text layer is thin and there is something visual on it (images or pen
+    strokes).  Truly blank pages are skipped.
     """
-    try:
-        import fitz
-    except ImportError:
-        return "[ERROR] PyMuPDF not installed. Run: pip install pymupdf"
-
-    try:
-        data = uploaded_file.read()
-        doc  = fitz.open(stream=data, filetype="pdf")
+    cover = _image_cover(page)
+    if cover > PAGE_IMAGE_MAX_COVER:
+        return True
+    if len(text) >= PAGE_TEXT_MIN_CHARS:
+        return False
+    return cover > 0 or bool(page.get_drawings())
 
-        # Try direct text extraction ------------------------------------------
-        pages_text = [page.get_text().strip() for page in doc]
-        full_text  = "\n".join(pages_text).strip()
 
-        if len(full_text) > 50:
-            return full_text          # Digital PDF — done
+def _render_page_jpeg(fitz, page):
+    """
+    Rasterise one PDF page to grayscale JPEG bytes for OCR.
+    DPI is chosen so the long side lands near RENDER_TARGET_PX (within
+    RENDER_DPI_RANGE); if the JPEG exceeds MAX_IMAGE_BYTES, quality and
+    then resolution are stepped down until it fits.
+    """
+    lo, hi = RENDER_DPI_RANGE
+    long_pt = max(page.rect.width, page.rect.height) or 792
+    dpi     = max(lo, min(hi, RENDER_TARGET_PX * 72 / long_pt))
+
+    with telemetry.span("pdf.render_page"):
+        while True:
+            pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY)
+            for quality in JPEG_QUALITIES:
+                img_bytes = pix.tobytes("jpeg", jpg_quality=quality)
+                if len(img_bytes) <= MAX_IMAGE_BYTES:
+                    return img_bytes
+                telemetry.count("pdf.render_downscales")
+            if dpi <= lo:
+                return img_bytes          # smallest we are willing to go
+            dpi = max(lo, dpi * 0.75)
+
+
+def _ocr_pages(fitz, doc, page_numbers=None, api_key=None, max_workers=4, max_in_flight=None):
+    """
+    Pipelined OCR of the given 1-based `page_numbers` (default: every page).
+    The calling thread renders pages (PyMuPDF documents are not thread-safe) and
+    hands them to a pool of OCR workers; at most `max_in_flight` rendered pages
+    are held in memory at once.  Without an API key, Tesseract work is spread
+    over get_tesseract_pool().  Returns {page_number: text} — a page that fails
+    to render or OCR yields an error note instead of aborting.
+    """
+    n_pages = len(doc)
+    pages   = list(page_numbers) if page_numbers is not None else range(1, n_pages + 1)
+    workers = max(1, int(max_workers))
 
-        # Scanned / image-based PDF → render pages and OCR -------------------
-        all_text = []
-        for page_num, page in enumerate(doc, 1):
-            mat       = fitz.Matrix(200 / 72, 200 / 72)   # 200 DPI
-            pix       = page.get_pixmap(matrix=mat, colorspace=fitz.csRGB)
-            img_bytes = pix.tobytes("jpeg")
+    # Offline: Tesseract is CPU-bound, so fan pages out across processes, one per core
+    proc_pool = get_tesseract_pool() if not api_key and len(pages) > 1 else None
+    if proc_pool is not None:
+        workers = max(workers, _tesseract_processes())
+    slots   = threading.BoundedSemaphore(max_in_flight or 2 * workers)
 
-            page_text = _ocr_image_bytes(
+    def ocr_page(page_num, img_bytes):
+        try:
+            return _ocr_image_bytes(
                 img_bytes,
                 mime_type="image/jpeg",
                 api_key=api_key,
-                context=f"page {page_num} of {len(doc)}",
+                context=f"page {page_num} of {n_pages}",
+                tesseract_pool=proc_pool,
             )
+        except Exception as e:
+            return f"[OCR error on page {page_num}: {e}]"
+        finally:
+            slots.release()
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for page_num in pages:
+            slots.acquire()
+            try:
+                img_bytes = _render_page_jpeg(fitz, doc[page_num - 1])
+            except Exception as e:
+                slots.release()
+                pending[page_num] = f"[Render error on page {page_num}: {e}]"
+                continue
+            pending[page_num] = pool.submit(ocr_page, page_num, img_bytes)
+
+    return {n: p if isinstance(p, str) else p.result() for n, p in pending.items()}
+
+
+def extract_text_from_pdf(uploaded_file, api_key=None, max_workers=4):
+    """
+    Extract text from a PDF, deciding page by page.
+    • Digital pages → direct text via PyMuPDF (fast, accurate)
+    • Scanned/image pages (handwriting) → render as grayscale JPEG and OCR,
+      with up to `max_workers` pages being OCR'd concurrently
+    Mixed documents (e.g. a typed cover page + handwritten answers) get both.
+    """
+    try:
+        import fitz
+    except ImportError:
+        return "[ERROR] PyMuPDF not installed. Run: pip install pymupdf"
+
+    try:
+        with telemetry.span("file.read", kind="pdf"):
+            data = uploaded_file.read()
+        with telemetry.span("pdf.parse"):
+            doc  = fitz.open(stream=data, filetype="pdf")
+
+            # Direct text extraction, then classify each page ----------------
+            pages_text = [page.get_text().strip() for page in doc]
+            ocr_needed = [n for n, (page, text) in enumerate(zip(doc, pages_text), 1) if _page_needs_ocr(page, text)]
+        telemetry.count("pdf.pages", len(ocr_needed), kind="ocr")
+        telemetry.count("pdf.pages", len(pages_text) - len(ocr_needed), kind="text")
+
+        if not ocr_needed:
+            return "\n".join(pages_text).strip() or "[No text could be extracted from this PDF]"  # Fully digital
+
+        # Render and OCR only the image pages --------------------------------
+        ocr_text = _ocr_pages(fitz, doc, ocr_needed, api_key, max_workers)
+        all_text = []
+        for page_num, text in enumerate(pages_text, 1):
+            page_text = ocr_text.get(page_num, text)
             if page_text:
                 all_text.append(f"--- Page {page_num} ---\n{page_text}")
 
@@ -123,52 +377,80 @@ def extract_text_from_image(uploaded_file, api_key=None):
     Extract text from an image (including handwriting).
     Uses Groq Vision LLM first, falls back to Tesseract.
     """
-    image_data = uploaded_file.read()
+    with telemetry.span("file.read", kind="image"):
+        image_data = uploaded_file.read()
     mime_type  = uploaded_file.type or "image/jpeg"
     return _ocr_image_bytes(image_data, mime_type=mime_type, api_key=api_key)
 
 
-# ── PDF report generation ─────────────────────────────────────────────────────
+# ── Uploads ───────────────────────────────────────────────────────────────────
 
-def generate_pdf_report(result, model, strictness):
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.units import inch
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER
-        from io import BytesIO
+class Upload:
+    """
+    In-memory stand-in for a Streamlit UploadedFile (.name, .type, .read(),
+    .getvalue()), so the extractors also work on job payloads and local files.
+    """
 
-        buffer = BytesIO()
-        doc    = SimpleDocTemplate(buffer, pagesize=letter,
-                                   topMargin=0.5*inch, bottomMargin=0.5*inch)
-        styles = getSampleStyleSheet()
-        story  = []
-
-        title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=22,
-                                     textColor=colors.HexColor('#1e3a5f'),
-                                     alignment=TA_CENTER, spaceAfter=10)
-        heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=13,
-                                       textColor=colors.HexColor('#2e75b6'),
-                                       spaceBefore=10, spaceAfter=5)
-
-        story.append(Paragraph("SmartGrade AI - Evaluation Report", title_style))
-        story.append(Spacer(1, 0.2*inch))
-
-        te  = result.get("total_earned", 0)
-        tm  = result.get("total_max", 0)
-        pct = round((te / tm * 100) if tm else 0, 1)
-
-        summary_data = [
-            ['Score',      f'{te} / {tm}'],
-            ['Percentage', f'{pct}%'],
-            ['Grade',      f'{result.get("grade","N/A")} - {result.get("grade_name","N/A")}'],
-            ['Model',      model],
-            ['Strictness', strictness],
-        ]
-        summary_table = Table(summary_data, colWidths=[2*inch, 4*inch])
-        summary_table.setStyle(TableStyle([
+    def __init__(self, data, mime_type, name=""):
+        self._data = data
+        self.type  = mime_type
+        self.name  = name
+
+    @classmethod
+    def from_path(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        return cls(data, mimetypes.guess_type(path)[0] or "application/octet-stream", os.path.basename(path))
+
+    def read(self):
+        return self._data
+
+    def getvalue(self):
+        return self._data
+
+
+def needs_extraction(mime_type):
+    """True for PDFs and images, whose text has to be extracted (possibly by OCR)."""
+    return mime_type == "application/pdf" or (mime_type or "").startswith("image")
+
+
+def read_file(uploaded_file, api_key=None):
+    """Text of an upload: PDFs and images go through the extractors, anything else is read as UTF-8."""
+    if uploaded_file.type == "application/pdf":
+        return extract_text_from_pdf(uploaded_file, api_key=api_key)
+    if needs_extraction(uploaded_file.type):
+        return extract_text_from_image(uploaded_file, api_key=api_key)
+    return uploaded_file.read().decode("utf-8")
+
+
+# ── PDF report generation ─────────────────────────────────────────────────────
+
+@lru_cache(maxsize=1)
+def _report_styles():
+    """
+    ReportLab imports, paragraph styles and table styles, built once per process
+    and shared by every report.  Raises ImportError if reportlab is missing.
+    """
+    from types import SimpleNamespace
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+
+    styles = getSampleStyleSheet()
+    return SimpleNamespace(
+        letter=letter, inch=inch, SimpleDocTemplate=SimpleDocTemplate, Paragraph=Paragraph,
+        Spacer=Spacer, Table=Table, PageBreak=PageBreak,
+        normal=styles['Normal'],
+        title=ParagraphStyle('Title', parent=styles['Heading1'], fontSize=22,
+                             textColor=colors.HexColor('#1e3a5f'),
+                             alignment=TA_CENTER, spaceAfter=10),
+        heading=ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=13,
+                               textColor=colors.HexColor('#2e75b6'),
+                               spaceBefore=10, spaceAfter=5),
+        summary_table=TableStyle([
             ('BACKGROUND',    (0,0), (0,-1), colors.HexColor('#e6f2ff')),
             ('TEXTCOLOR',     (0,0), (-1,-1), colors.black),
             ('FONTNAME',      (0,0), (0,-1), 'Helvetica-Bold'),
@@ -176,55 +458,224 @@ def generate_pdf_report(result, model, strictness):
             ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
             ('TOPPADDING',    (0,0), (-1,-1), 8),
             ('BOTTOMPADDING', (0,0), (-1,-1), 8),
-        ]))
-        story.append(summary_table)
-        story.append(Spacer(1, 0.3*inch))
-
-        story.append(Paragraph("Overall Feedback", heading_style))
-        story.append(Paragraph(result.get("overall_feedback", ""), styles['Normal']))
-        story.append(Spacer(1, 0.2*inch))
-
-        story.append(Paragraph("Question-wise Analysis", heading_style))
-        story.append(Spacer(1, 0.1*inch))
-
-        questions = result.get("questions", [])
-        for i, q in enumerate(questions, 1):
-            q_text = q.get('question', '')[:100]
-            story.append(Paragraph(f"<b>Q{i}. {q_text}...</b>", styles['Normal']))
-            story.append(Spacer(1, 0.05*inch))
-
-            earned = q.get("earned", 0)
-            max_m  = q.get("max_marks", 0)
-            sim    = q.get("similarity_score", 0)
-
-            q_data = [
-                ['Marks',      f'{earned} / {max_m}'],
-                ['Similarity', f'{sim}%'],
-                ['Feedback',   q.get('feedback', '')],
-            ]
-            kp = q.get("key_points_covered", [])
-            if kp: q_data.append(['Covered', ', '.join(kp)])
-            mp = q.get("missing_points", [])
-            if mp: q_data.append(['Missing', ', '.join(mp)])
-
-            q_table = Table(q_data, colWidths=[1.2*inch, 4.8*inch])
-            q_table.setStyle(TableStyle([
-                ('BACKGROUND',    (0,0), (0,-1), colors.HexColor('#f5f5f5')),
-                ('FONTNAME',      (0,0), (0,-1), 'Helvetica-Bold'),
-                ('FONTSIZE',      (0,0), (-1,-1), 9),
-                ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
-                ('VALIGN',        (0,0), (-1,-1), 'TOP'),
-                ('TOPPADDING',    (0,0), (-1,-1), 6),
-                ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-            ]))
-            story.append(q_table)
-            story.append(Spacer(1, 0.15*inch))
-
-            if i % 2 == 0 and i < len(questions):
-                story.append(PageBreak())
-
-        doc.build(story)
+        ]),
+        question_table=TableStyle([
+            ('BACKGROUND',    (0,0), (0,-1), colors.HexColor('#f5f5f5')),
+            ('FONTNAME',      (0,0), (0,-1), 'Helvetica-Bold'),
+            ('FONTSIZE',      (0,0), (-1,-1), 9),
+            ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
+            ('VALIGN',        (0,0), (-1,-1), 'TOP'),
+            ('TOPPADDING',    (0,0), (-1,-1), 6),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+        ]),
+        class_table=TableStyle([
+            ('BACKGROUND',    (0,0), (-1,0), colors.HexColor('#e6f2ff')),
+            ('FONTNAME',      (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTSIZE',      (0,0), (-1,-1), 9),
+            ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
+            ('TOPPADDING',    (0,0), (-1,-1), 4),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+        ]),
+    )
+
+
+def _new_doc(st, buffer):
+    return st.SimpleDocTemplate(buffer, pagesize=st.letter,
+                                topMargin=0.5*st.inch, bottomMargin=0.5*st.inch)
+
+
+def _report_story(result, model, strictness, student=None):
+    st    = _report_styles()
+    inch  = st.inch
+    story = []
+
+    story.append(st.Paragraph("SmartGrade AI - Evaluation Report", st.title))
+    story.append(st.Spacer(1, 0.2*inch))
+
+    te  = result.get("total_earned", 0)
+    tm  = result.get("total_max", 0)
+    pct = round((te / tm * 100) if tm else 0, 1)
+
+    summary_data = [
+        ['Score',      f'{te} / {tm}'],
+        ['Percentage', f'{pct}%'],
+        ['Grade',      f'{result.get("grade","N/A")} - {result.get("grade_name","N/A")}'],
+        ['Model',      model],
+        ['Strictness', strictness],
+    ]
+    if student:
+        summary_data.insert(0, ['Student', student])
+    summary_table = st.Table(summary_data, colWidths=[2*inch, 4*inch])
+    summary_table.setStyle(st.summary_table)
+    story.append(summary_table)
+    story.append(st.Spacer(1, 0.3*inch))
+
+    story.append(st.Paragraph("Overall Feedback", st.heading))
+    story.append(st.Paragraph(result.get("overall_feedback", ""), st.normal))
+    story.append(st.Spacer(1, 0.2*inch))
+
+    story.append(st.Paragraph("Question-wise Analysis", st.heading))
+    story.append(st.Spacer(1, 0.1*inch))
+
+    questions = result.get("questions", [])
+    for i, q in enumerate(questions, 1):
+        q_text = q.get('question', '')[:100]
+        story.append(st.Paragraph(f"<b>Q{i}. {q_text}...</b>", st.normal))
+        story.append(st.Spacer(1, 0.05*inch))
+
+        earned = q.get("earned", 0)
+        max_m  = q.get("max_marks", 0)
+        sim    = q.get("similarity_score", 0)
+
+        q_data = [
+            ['Marks',      f'{earned} / {max_m}'],
+            ['Similarity', f'{sim}%'],
+            ['Feedback',   q.get('feedback', '')],
+        ]
+        kp = q.get("key_points_covered", [])
+        if kp: q_data.append(['Covered', ', '.join(kp)])
+        mp = q.get("missing_points", [])
+        if mp: q_data.append(['Missing', ', '.join(mp)])
+
+        q_table = st.Table(q_data, colWidths=[1.2*inch, 4.8*inch])
+        q_table.setStyle(st.question_table)
+        story.append(q_table)
+        story.append(st.Spacer(1, 0.15*inch))
+
+        if i % 2 == 0 and i < len(questions):
+            story.append(st.PageBreak())
+
+    return story
+
+
+def generate_pdf_report(result, model, strictness, student=None):
+    try:
+        from io import BytesIO
+
+        buffer = BytesIO()
+        with telemetry.span("report.build"):
+            _new_doc(_report_styles(), buffer).build(_report_story(result, model, strictness, student))
         buffer.seek(0)
         return buffer.getvalue()
-    except Exception:
-        return None
\ No newline at end of file
+    except Exception as e:
+        telemetry.count("report.failures", error=type(e).__name__)
+        return None
+
+
+def _render_report(args):
+    """Process-pool entry point: args is (result, model, strictness, student)."""
+    return generate_pdf_report(*args)
+
+
+def iter_pdf_reports(results, model, strictness, students=None, max_workers=None, min_parallel=8):
+    """
+    Yield one PDF (bytes, or None on failure) per result, in order.
+    Batches of at least `min_parallel` are rendered across a process pool
+    (default one worker per core) with a bounded window of in-flight reports,
+    so finished PDFs never pile up in memory; smaller batches render inline.
+    """
+    results  = list(results)
+    students = list(students) if students is not None else [None] * len(results)
+    jobs     = [(r, model, strictness, name) for r, name in zip(results, students)]
+
+    workers = max_workers or os.cpu_count() or 1
+    if len(jobs) < min_parallel or workers < 2:
+        for job in jobs:
+            yield _render_report(job)
+        return
+
+    import multiprocessing
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            window = deque()
+            for job in jobs:
+                window.append(pool.submit(_render_report, job))
+                if len(window) >= 2 * workers:
+                    pdf = window.popleft().result()
+                    done += 1
+                    yield pdf
+            while window:
+                pdf = window.popleft().result()
+                done += 1
+                yield pdf
+    except BrokenExecutor:
+        # Worker died (or could not spawn) — finish the rest in this process
+        telemetry.count("report.pool_failures")
+        for job in jobs[done:]:
+            yield _render_report(job)
+
+
+def generate_pdf_reports(results, model, strictness, students=None, max_workers=None):
+    """Per-student PDFs for a whole batch (see iter_pdf_reports).  Returns a list in input order."""
+    return list(iter_pdf_reports(results, model, strictness, students, max_workers))
+
+
+def _class_summary_pdf(results, students, model, strictness):
+    st    = _report_styles()
+    inch  = st.inch
+    story = [st.Paragraph("SmartGrade AI - Class Report", st.title),
+             st.Paragraph(f"Model: {model} &nbsp;·&nbsp; Strictness: {strictness} &nbsp;·&nbsp; "
+                          f"{len(results)} students", st.normal),
+             st.Spacer(1, 0.2*inch)]
+
+    rows, pcts = [['#', 'Student', 'Score', '%', 'Grade']], []
+    for i, (r, name) in enumerate(zip(results, students), 1):
+        if "error" in r:
+            rows.append([i, name, '—', '—', 'Error'])
+            continue
+        te, tm = r.get("total_earned", 0), r.get("total_max", 0)
+        pct    = round((te / tm * 100) if tm else 0, 1)
+        pcts.append(pct)
+        rows.append([i, name, f'{te} / {tm}', f'{pct}%', r.get("grade", "N/A")])
+
+    if pcts:
+        story.append(st.Paragraph(f"Class average: {round(sum(pcts) / len(pcts), 1)}% &nbsp;·&nbsp; "
+                                  f"Highest: {max(pcts)}% &nbsp;·&nbsp; Lowest: {min(pcts)}%", st.normal))
+        story.append(st.Spacer(1, 0.2*inch))
+
+    table = st.Table(rows, colWidths=[0.5*inch, 2.9*inch, 1.1*inch, 0.8*inch, 0.7*inch], repeatRows=1)
+    table.setStyle(st.class_table)
+    story.append(table)
+
+    from io import BytesIO
+    buffer = BytesIO()
+    _new_doc(st, buffer).build(story)
+    return buffer.getvalue()
+
+
+def generate_class_report(results, students, model, strictness, path=None, max_workers=None):
+    """
+    One combined class PDF: a summary table of every student, followed by each
+    student's full report.  Student reports are rendered in a process pool and
+    appended one at a time (PyMuPDF), so no more than a window of rendered
+    reports is ever held in memory.  Writes to `path` and returns it, or
+    returns the PDF bytes when no path is given; None on failure.
+    """
+    try:
+        import fitz
+
+        with telemetry.span("report.class"):
+            results  = list(results)
+            students = [s or f"Student {i}" for i, s in enumerate(students or [None] * len(results), 1)]
+            combined = fitz.open()
+            combined.insert_pdf(fitz.open(stream=_class_summary_pdf(results, students, model, strictness), filetype="pdf"))
+
+            graded = [(r, name) for r, name in zip(results, students) if "error" not in r]
+            for pdf in iter_pdf_reports([r for r, _ in graded], model, strictness,
+                                        [name for _, name in graded], max_workers):
+                if pdf:
+                    with fitz.open(stream=pdf, filetype="pdf") as part:
+                        combined.insert_pdf(part)
+
+            if path:
+                combined.save(path, garbage=3, deflate=True)
+                return path
+            return combined.tobytes(garbage=3, deflate=True)
+    except Exception as e:
+        telemetry.count("report.failures", error=type(e).__name__)
+        print(f"[Class report warning]: {e}")
+        return None